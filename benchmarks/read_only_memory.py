@@ -0,0 +1,109 @@
+"""Memory retained by the request session after resolving a large
+connection page, with and without ``read_only``.
+
+The identity map of the default field only holds the instances weakly,
+but its table grows with them and doesn't shrink once they are released.
+
+Usage: python benchmarks/read_only_memory.py [rows]
+"""
+import gc
+import sys
+import tracemalloc
+
+import graphene
+from graphene.relay import Connection, Node
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from graphene_sqlalchemy import SQLAlchemyConnectionField, SQLAlchemyObjectType
+from graphene_sqlalchemy.tests.models import Base, Reporter
+
+
+class ReporterNode(SQLAlchemyObjectType):
+    class Meta:
+        model = Reporter
+        interfaces = (Node,)
+
+
+class ReporterConnection(Connection):
+    class Meta:
+        node = ReporterNode
+
+
+class ReadOnlyConnectionField(SQLAlchemyConnectionField):
+    read_only = True
+
+
+class Query(graphene.ObjectType):
+    reporters = SQLAlchemyConnectionField(ReporterConnection)
+    read_only_reporters = ReadOnlyConnectionField(ReporterConnection)
+
+
+schema = graphene.Schema(query=Query)
+
+
+query = "query ($first: Int) { %s(first: $first) { edges { node { id firstName email } } } }"
+
+
+def warmup(engine, field):
+    """Fills the caches of the field (compiled and baked queries), which
+    would otherwise be counted as retained by the first measure."""
+    session = Session(bind=engine)
+    result = schema.execute(
+        query % field, variables={"first": 1}, context_value={"session": session}
+    )
+    assert not result.errors
+    session.close()
+
+
+def measure(engine, field, rows):
+    """Returns the memory retained after the request, before the session
+    is closed, the peak memory of the request, in bytes, and the number of
+    instances still in the session."""
+    session = Session(bind=engine)
+    gc.collect()
+    tracemalloc.start()
+    result = schema.execute(
+        query % field, variables={"first": rows}, context_value={"session": session}
+    )
+    assert not result.errors
+    del result
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tracked = len(session.identity_map)
+    session.close()
+    return retained, peak, tracked
+
+
+def main(rows=20000):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = Session(bind=engine)
+    session.bulk_insert_mappings(
+        Reporter,
+        [
+            {"first_name": "Reporter_{}".format(i), "email": "reporter{}@example.com".format(i)}
+            for i in range(rows)
+        ],
+    )
+    session.commit()
+    session.close()
+
+    print("{} rows".format(rows))
+    print("{:<24} {:>14} {:>14} {:>10}".format("field", "retained (kB)", "peak (kB)", "tracked"))
+    for name, field in (
+        ("reporters", "reporters"),
+        ("readOnlyReporters", "readOnlyReporters"),
+    ):
+        warmup(engine, field)
+        retained, peak, tracked = measure(engine, field, rows)
+        print(
+            "{:<24} {:>14.0f} {:>14.0f} {:>10}".format(
+                name, retained / 1024.0, peak / 1024.0, tracked
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
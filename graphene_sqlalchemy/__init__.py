@@ -1,6 +1,8 @@
 from .types import SQLAlchemyObjectType
-from .fields import SQLAlchemyConnectionField
+from .fields import NodeField, NodesField, SQLAlchemyConnectionField
+from .selection import eager_load, load_selected_columns
 from .utils import get_query, get_session
+from .warmup import warmup
 
 __version__ = "2.1.0"
 
@@ -8,6 +10,11 @@ __all__ = [
     "__version__",
     "SQLAlchemyObjectType",
     "SQLAlchemyConnectionField",
+    "NodeField",
+    "NodesField",
+    "eager_load",
+    "load_selected_columns",
     "get_query",
     "get_session",
+    "warmup",
 ]
@@ -0,0 +1,124 @@
+import sqlalchemy
+from sqlalchemy import bindparam
+from sqlalchemy.ext import baked
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.orm import scoped_session
+from sqlalchemy.orm.path_registry import PathRegistry
+
+from .memo import memoize_key
+
+# Cache of the compiled queries built by the fields and loaders, keyed by
+# their shape (model, loader options, sort...). Only the parameters are
+# bound on each request.
+bakery = baked.bakery(size=1000)
+# The baked queries rely on the cache keys of the loader options of SQLAlchemy
+# 1.3. Later versions cache the compiled statements of every query instead,
+# so the queries are built as usual there.
+BAKED_QUERIES = tuple(
+    int(part) for part in sqlalchemy.__version__.split(".")[:2]
+) < (1, 4)
+
+
+def get_options_key(model, options):
+    """Returns a key identifying the effect of the loader ``options`` on a
+    query of ``model``, or None if they can't be part of a baked query."""
+    if not BAKED_QUERIES:
+        return None
+    path = PathRegistry.root[sqlalchemyinspect(model)]
+    key = []
+    for option in options:
+        option_key = option._generate_cache_key(path)
+        if option_key is False:
+            return None
+        if option_key is not None:
+            key.append(option_key)
+    return tuple(key)
+
+
+def _query(model):
+    return bakery(lambda session: session.query(model), model)
+
+
+def get_baked_query(model, options=(), order_by=(), order_by_key=()):
+    """Returns the baked query of ``model`` with the loader ``options`` and
+    sorted by ``order_by``, identified by ``order_by_key``. Returns None if
+    the options can't be baked."""
+    options_key = get_options_key(model, options)
+    if options_key is None:
+        return None
+    baked_query = _query(model)
+    if options:
+        baked_query.add_criteria(lambda query: query.options(*options), options_key)
+    if order_by:
+        baked_query.add_criteria(lambda query: query.order_by(*order_by), order_by_key)
+    return baked_query
+
+
+def get_sorted_baked_query(model, options=(), sort=None):
+    """Returns the baked query of ``model`` with the loader ``options`` and
+    sorted by ``sort``, the value of the ``sort`` argument of a connection
+    field, or None if the options can't be baked."""
+    if sort is None:
+        sort = []
+    elif isinstance(sort, str):
+        sort = [sort]
+    return get_baked_query(
+        model,
+        options,
+        order_by=[item.value for item in sort],
+        order_by_key=tuple(str(item) for item in sort),
+    )
+
+
+def get_primary_key_query(model, options=()):
+    """Returns the baked query of the instances of ``model`` whose primary
+    key is in the ``keys`` parameter, or None for composite primary keys."""
+    columns = sqlalchemyinspect(model).primary_key
+    if len(columns) != 1:
+        return None
+    baked_query = get_baked_query(model, options)
+    if baked_query is None:
+        return None
+    column = columns[0]
+    baked_query.add_criteria(
+        lambda query: query.filter(column.in_(bindparam("keys", expanding=True)))
+    )
+    return baked_query
+
+
+def _offset(query):
+    return query.offset(bindparam("offset"))
+
+
+def _limit(query):
+    return query.limit(bindparam("limit"))
+
+
+def bake_slices(baked_query, session):
+    """Compiles ``baked_query`` and the slices of it fetched by
+    ``fetch_slice`` ahead of time, for sessions like ``session``."""
+    for query in (
+        baked_query,
+        baked_query.with_criteria(_limit),
+        baked_query.with_criteria(_offset).with_criteria(_limit),
+    ):
+        query._bake(session)
+
+
+def fetch_slice(baked_query, session, start, end=None, memo=None):
+    """Returns the rows ``start`` to ``end`` of ``baked_query``, running
+    identical queries only once per ``memo``, like ``memo.fetch_all``."""
+    if isinstance(session, scoped_session):
+        session = session()
+    params = {}
+    if start:
+        baked_query = baked_query.with_criteria(_offset)
+        params["offset"] = start
+    if end is not None:
+        baked_query = baked_query.with_criteria(_limit)
+        params["limit"] = max(end - start, 0)
+    key = (baked_query._cache_key, tuple(sorted(params.items())))
+    rows = memoize_key(
+        memo, session, key, lambda: baked_query(session).params(**params).all()
+    )
+    return list(rows)
@@ -0,0 +1,471 @@
+from collections import defaultdict, namedtuple
+
+from promise import Promise
+from promise.dataloader import DataLoader
+from sqlalchemy import and_, func, or_
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.orm import aliased, interfaces, scoped_session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .bakery import get_primary_key_query
+from .utils import get_transaction_read_only_session, on_transaction_end
+
+# Key under which the loaders are stored in ``Session.info``. The session is
+# the unit of work of a request, so loaders (and their batches) never leak
+# from one request into another.
+_LOADERS_KEY = "graphene_sqlalchemy.loaders"
+# Key under which the instances of the pages of the connection fields with
+# ``keep_instances`` are kept
+_IDENTITIES_KEY = "graphene_sqlalchemy.identities"
+# Key under which the QueryPool running the queries of the loaders is stored
+_QUERY_POOL_KEY = "graphene_sqlalchemy.query_pool"
+# Largest number of keys fetched by a loader with one query: larger batches
+# are split, as databases limit the parameters of a statement (999 with the
+# default build of SQLite before 3.32, shared by the columns of composite keys)
+MAX_BATCH_SIZE = 250
+
+
+def get_loaders(session):
+    return session.info.setdefault(_LOADERS_KEY, {})
+
+
+def get_identities(session):
+    return session.info.setdefault(_IDENTITIES_KEY, {})
+
+
+def get_session_query_pool(session):
+    return session.info.get(_QUERY_POOL_KEY)
+
+
+def run_query(session, fetch, *args):
+    """Returns a promise of ``fetch(session, *args)``. If a ``QueryPool`` is
+    bound to ``session``, ``fetch`` runs in its thread pool with a session
+    of its own instead."""
+    pool = get_session_query_pool(session)
+    if pool is None:
+        return Promise.resolve(fetch(session, *args))
+    return Promise.resolve(pool.run(fetch, *args))
+
+
+def keep_identities(instances):
+    """Keeps the persistent ``instances`` until the end of the transaction
+    of their session, keyed by identity (model and primary key).
+
+    The identity map of the session only references its instances weakly, so
+    the rows of a connection would be dropped once resolved. Keeping them
+    alive lets the primary key loaders (and lazy many-to-one loads) find
+    them in the identity map rather than querying them again.
+    """
+    identities = None
+    for instance in instances:
+        state = sqlalchemyinspect(instance, raiseerr=False)
+        if state is None or state.key is None:
+            continue
+        if identities is None:
+            session = state.session
+            if session is None:
+                continue
+            identities = get_identities(session)
+        identities[state.key] = instance
+
+
+def is_kept(state):
+    """Returns whether the instance of ``state`` is kept by ``keep_identities``"""
+    return state.key in state.session.info.get(_IDENTITIES_KEY, ())
+
+
+def get_primary_key_loader(session, model):
+    loaders = get_loaders(session)
+    key = (PrimaryKeyLoader, model)
+    loader = loaders.get(key)
+    if loader is None:
+        loader = loaders[key] = PrimaryKeyLoader(
+            session, model, baked_query=get_primary_key_query(model)
+        )
+    return loader
+
+
+def get_node_loader(query, model, key, session=None):
+    """Returns the loader fetching instances of ``model`` by primary key with
+    ``query``, stored under ``key`` in ``session`` (by default, the session
+    of the query)."""
+    loaders = get_loaders(session if session is not None else query.session)
+    key = (PrimaryKeyLoader, model, key)
+    loader = loaders.get(key)
+    if loader is None:
+        loader = loaders[key] = PrimaryKeyLoader(query.session, model, query)
+    return loader
+
+
+def get_baked_node_loader(session, model, options, key, read_only=False):
+    """Returns the loader fetching instances of ``model`` by primary key with
+    a baked query with the loader ``options``, stored under ``key``. With
+    ``read_only``, the instances are fetched with a read-only session of
+    ``session``, closed at the end of its transaction."""
+    loaders = get_loaders(session)
+    key = (PrimaryKeyLoader, model, key)
+    loader = loaders.get(key)
+    if loader is None:
+        if read_only:
+            session = get_transaction_read_only_session(session, model) or session
+        baked_query = get_primary_key_query(model, options)
+        query = None
+        if baked_query is None:
+            query = session.query(model).options(*options)
+        loader = loaders[key] = PrimaryKeyLoader(session, model, query, baked_query)
+    return loader
+
+
+def get_relationship_loader(session, relationship):
+    loaders = get_loaders(session)
+    key = (RelationshipLoader, relationship)
+    loader = loaders.get(key)
+    if loader is None:
+        loader = loaders[key] = RelationshipLoader(session, relationship)
+    return loader
+
+
+def get_connection_loader(
+    session, relationship, start_offset, end_offset, order_by, count, keep_instances=False
+):
+    loaders = get_loaders(session)
+    key = (
+        ConnectionLoader,
+        relationship,
+        start_offset,
+        end_offset,
+        tuple(str(clause) for clause in order_by),
+        count,
+        keep_instances,
+    )
+    loader = loaders.get(key)
+    if loader is None:
+        loader = loaders[key] = ConnectionLoader(
+            session,
+            relationship,
+            start_offset,
+            end_offset,
+            order_by,
+            count,
+            keep_instances,
+        )
+    return loader
+
+
+def filter_by_primary_keys(columns, keys):
+    """Returns a clause matching any of the primary key tuples in ``keys``"""
+    if len(columns) == 1:
+        return columns[0].in_([key[0] for key in keys])
+    return or_(
+        *(and_(*(column == value for column, value in zip(columns, key))) for key in keys)
+    )
+
+
+class PrimaryKeyLoader(DataLoader):
+    """DataLoader fetching instances of a model by primary key.
+
+    Every key requested during the same tick is resolved with a single
+    ``WHERE pk IN (...)`` query. Instances already present in the identity
+    map of the session are returned without querying the database.
+    The missing ones are fetched with ``query``, if given, so that its
+    options (and filters) apply, else with a baked query. Batches of more
+    than ``max_batch_size`` keys are fetched with one query per chunk.
+    """
+
+    # The session identity map already acts as the cache
+    cache = False
+    max_batch_size = MAX_BATCH_SIZE
+
+    def __init__(self, session, model, query=None, baked_query=None):
+        super(PrimaryKeyLoader, self).__init__()
+        if isinstance(session, scoped_session):
+            session = session()
+        self.session = session
+        self.model = model
+        self.mapper = sqlalchemyinspect(model)
+        if query is None and baked_query is None:
+            query = session.query(model)
+        self.query = query
+        self.baked_query = baked_query
+
+    def fetch(self, session, keys):
+        if self.query is None:
+            instances = self.baked_query(session).params(
+                keys=[key[0] for key in keys]
+            ).all()
+        else:
+            instances = (
+                self.query.with_session(session)
+                .filter(filter_by_primary_keys(self.mapper.primary_key, keys))
+                .all()
+            )
+        return instances
+
+    def batch_load_fn(self, keys):  # pylint: disable=method-hidden
+        mapper = self.mapper
+        identity_map = self.session.identity_map
+        found = {}
+        missing = []
+        for key in keys:
+            if key in found:
+                continue
+            instance = identity_map.get(mapper.identity_key_from_primary_key(key))
+            if instance is not None and not sqlalchemyinspect(instance).expired:
+                found[key] = instance
+            elif key not in missing:
+                missing.append(key)
+
+        def on_fetch(instances):
+            for instance in instances:
+                found[tuple(mapper.primary_key_from_instance(instance))] = instance
+            return [found.get(key) for key in keys]
+
+        if not missing:
+            return Promise.resolve(on_fetch([]))
+        return run_query(self.session, self.fetch, missing).then(on_fetch)
+
+
+class RelationshipLoader(DataLoader):
+    """DataLoader fetching a relationship for many parents at once.
+
+    The children of every parent requested during the same tick are loaded
+    with a single query joining from the parent through the relationship
+    (and its secondary table, if any), then grouped by parent primary key.
+    The loaded values are set on the parents, so later accesses to the
+    attribute don't hit the database again. Batches of more than
+    ``max_batch_size`` parents are loaded with one query per chunk.
+    """
+
+    cache = False
+    max_batch_size = MAX_BATCH_SIZE
+
+    def __init__(self, session, relationship):
+        super(RelationshipLoader, self).__init__()
+        self.session = session
+        self.relationship = relationship
+
+    def fetch(self, session, keys):
+        """Returns the children of the parents with the primary ``keys``, by
+        parent primary key."""
+        relationship = self.relationship
+        parent_mapper = relationship.parent
+        # Aliased, so that self-referential relationships join properly
+        parent = aliased(parent_mapper.entity)
+        pk_columns = [
+            getattr(parent, parent_mapper.get_property_by_column(column).key)
+            for column in parent_mapper.primary_key
+        ]
+        query = (
+            session.query(relationship.mapper.entity, *pk_columns)
+            .select_from(parent)
+            .join(getattr(parent, relationship.key))
+            .filter(filter_by_primary_keys(pk_columns, keys))
+        )
+        if relationship.order_by:
+            query = query.order_by(*relationship.order_by)
+
+        children = defaultdict(list)
+        for row in query:
+            children[tuple(row[1:])].append(row[0])
+        return children
+
+    def batch_load_fn(self, parents):  # pylint: disable=method-hidden
+        relationship = self.relationship
+        parent_mapper = relationship.parent
+        keys = []
+        for instance in parents:
+            key = tuple(parent_mapper.primary_key_from_instance(instance))
+            if key not in keys:
+                keys.append(key)
+
+        def on_fetch(children):
+            values = []
+            for instance in parents:
+                collection = children.get(
+                    tuple(parent_mapper.primary_key_from_instance(instance)), []
+                )
+                if relationship.uselist:
+                    value = collection
+                else:
+                    value = collection[0] if collection else None
+                set_committed_value(instance, relationship.key, value)
+                values.append(value)
+            return values
+
+        return run_query(self.session, self.fetch, keys).then(on_fetch)
+
+
+# A page of the children of a parent: the rows from `start_offset`, whether
+# there are more rows after them, and the total number of children (or None)
+ConnectionPage = namedtuple(
+    "ConnectionPage", ["rows", "start_offset", "has_next_page", "length"]
+)
+
+
+class ConnectionLoader(DataLoader):
+    """DataLoader fetching a page of a relationship for many parents at once.
+
+    The rows between ``start_offset`` and ``end_offset`` (plus one, to know
+    if there are more) of every parent requested during the same tick are
+    loaded with a single query, numbering the children of each parent with
+    ``ROW_NUMBER() OVER (PARTITION BY parent ORDER BY ...)``. When ``count``
+    is set, the number of children of every parent is fetched with one
+    grouped ``COUNT``. With ``keep_instances``, the children are kept in the
+    session, see ``keep_identities``. Batches of more than ``max_batch_size``
+    parents are loaded with one query per chunk.
+    """
+
+    cache = False
+    max_batch_size = MAX_BATCH_SIZE
+
+    def __init__(
+        self,
+        session,
+        relationship,
+        start_offset,
+        end_offset,
+        order_by,
+        count,
+        keep_instances=False,
+    ):
+        super(ConnectionLoader, self).__init__()
+        self.session = session
+        self.relationship = relationship
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+        self.order_by = order_by
+        self.count = count
+        self.keep_instances = keep_instances
+
+    def fetch(self, session, keys):
+        """Returns the rows of the pages of the parents with the primary
+        ``keys`` and their number of children (or None), by parent primary
+        key."""
+        relationship = self.relationship
+        parent_mapper = relationship.parent
+        parent = aliased(parent_mapper.entity)
+        pk_columns = [
+            getattr(parent, parent_mapper.get_property_by_column(column).key)
+            for column in parent_mapper.primary_key
+        ]
+
+        def select(*entities):
+            return (
+                session.query(*entities)
+                .select_from(parent)
+                .join(getattr(parent, relationship.key))
+                .filter(filter_by_primary_keys(pk_columns, keys))
+            )
+
+        row_number = func.row_number().over(
+            partition_by=pk_columns, order_by=self.order_by
+        )
+        numbered = select(
+            relationship.mapper.entity,
+            row_number.label("row_number"),
+            *(column.label("parent_{}".format(i)) for i, column in enumerate(pk_columns))
+        ).subquery()
+        parent_columns = [
+            numbered.c["parent_{}".format(i)] for i in range(len(pk_columns))
+        ]
+        query = session.query(
+            aliased(relationship.mapper.entity, numbered), *parent_columns
+        ).filter(numbered.c.row_number > self.start_offset)
+        if self.end_offset is not None:
+            query = query.filter(numbered.c.row_number <= self.end_offset + 1)
+        query = query.order_by(*(parent_columns + [numbered.c.row_number]))
+
+        children = defaultdict(list)
+        for row in query:
+            children[tuple(row[1:])].append(row[0])
+        if self.keep_instances:
+            keep_identities(child for rows in children.values() for child in rows)
+
+        lengths = None
+        if self.count:
+            lengths = {
+                tuple(row[:-1]): row[-1]
+                for row in select(*(pk_columns + [func.count()])).group_by(*pk_columns)
+            }
+        return children, lengths
+
+    def batch_load_fn(self, parents):  # pylint: disable=method-hidden
+        parent_mapper = self.relationship.parent
+        keys = []
+        for instance in parents:
+            key = tuple(parent_mapper.primary_key_from_instance(instance))
+            if key not in keys:
+                keys.append(key)
+
+        def on_fetch(result):
+            children, lengths = result
+            pages = []
+            for instance in parents:
+                key = tuple(parent_mapper.primary_key_from_instance(instance))
+                rows = children.get(key, [])
+                has_next_page = False
+                if self.end_offset is not None:
+                    page_size = self.end_offset - self.start_offset
+                    has_next_page = len(rows) > page_size
+                    rows = rows[:page_size]
+                length = None if lengths is None else lengths.get(key, 0)
+                pages.append(
+                    ConnectionPage(rows, self.start_offset, has_next_page, length)
+                )
+            return pages
+
+        return run_query(self.session, self.fetch, keys).then(on_fetch)
+
+
+def _many_to_one_local_attrs(relationship):
+    """Returns the parent attributes holding the primary key of the target,
+    in primary key order, or None if the relationship can't be batched."""
+    if relationship.secondary is not None:
+        return None
+    remote_to_local = {
+        remote: local for local, remote in relationship.local_remote_pairs
+    }
+    target_pk = relationship.mapper.primary_key
+    if set(remote_to_local) != set(target_pk):
+        return None
+    parent_mapper = relationship.parent
+    return [
+        parent_mapper.get_property_by_column(remote_to_local[column]).key
+        for column in target_pk
+    ]
+
+
+def get_batch_resolver(relationship):
+    """Returns a resolver loading ``relationship`` through a DataLoader.
+
+    Many-to-one relationships pointing to the primary key of their target go
+    through the primary key loader of the target model, any other
+    relationship through a loader dedicated to it.
+    """
+    key = relationship.key
+    model = relationship.mapper.entity
+    local_attrs = None
+    if relationship.direction == interfaces.MANYTOONE:
+        local_attrs = _many_to_one_local_attrs(relationship)
+
+    def resolve(root, info, **args):
+        state = sqlalchemyinspect(root)
+        if key not in state.unloaded or not state.persistent or state.modified:
+            # Already loaded, not persisted yet or pending changes: let the ORM decide
+            return getattr(root, key)
+        if local_attrs is None:
+            return get_relationship_loader(state.session, relationship).load(root)
+        pk = tuple(getattr(root, attr) for attr in local_attrs)
+        if None in pk:
+            return None
+        return get_primary_key_loader(state.session, model).load(pk)
+
+    return resolve
+
+
+@on_transaction_end
+def _clear_loaders(session):
+    # The loaders (and their batches) and the instances kept for the request
+    # don't outlive its transaction
+    session.info.pop(_LOADERS_KEY, None)
+    session.info.pop(_IDENTITIES_KEY, None)
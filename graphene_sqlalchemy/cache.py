@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache(object):
+    """Bounded mapping evicting its least recently used entries.
+
+    Entries also expire ``ttl`` seconds after being set, unless ``ttl`` is
+    None. It is safe to share between threads.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, timer=time.time):
+        assert maxsize > 0, "The maxsize of a cache must be positive"
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires is not None and expires <= self.timer():
+                return default
+            # Reinserting marks the entry as the most recently used
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else self.timer() + self.ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
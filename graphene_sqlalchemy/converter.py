@@ -6,7 +6,12 @@ from sqlalchemy.orm import interfaces
 from graphene import ID, Boolean, Dynamic, Enum, Field, Float, Int, List, String
 from graphene.types.json import JSONString
 
-from .fields import createConnectionField
+from .batching import get_batch_resolver
+from .fields import (
+    UnsortedSQLAlchemyConnectionField,
+    createBatchConnectionField,
+    createConnectionField,
+)
 
 try:
     from sqlalchemy_utils import ChoiceType, JSONType, ScalarListType, TSVectorType
@@ -22,7 +27,11 @@ def is_column_nullable(column):
     return bool(getattr(column, "nullable", True))
 
 
-def convert_sqlalchemy_relationship(relationship, registry):
+def has_custom_resolver(obj_type, name):
+    return getattr(obj_type, "resolve_{}".format(name), None) is not None
+
+
+def convert_sqlalchemy_relationship(relationship, registry, batching=False, obj_type=None):
     direction = relationship.direction
     model = relationship.mapper.entity
 
@@ -30,12 +39,21 @@ def convert_sqlalchemy_relationship(relationship, registry):
         _type = registry.get_type_for_model(model)
         if not _type:
             return None
+        batch = batching and not has_custom_resolver(obj_type, relationship.key)
+        resolver = get_batch_resolver(relationship) if batch else None
         if direction == interfaces.MANYTOONE or not relationship.uselist:
-            return Field(_type)
+            return Field(_type, resolver=resolver)
         elif direction in (interfaces.ONETOMANY, interfaces.MANYTOMANY):
             if _type._meta.connection:
-                return createConnectionField(_type._meta.connection)
-            return Field(List(_type))
+                if batch:
+                    return createBatchConnectionField(_type._meta.connection, relationship)
+                field = createConnectionField(_type._meta.connection)
+                if isinstance(
+                    field, UnsortedSQLAlchemyConnectionField
+                ) and not has_custom_resolver(obj_type, relationship.key):
+                    field.relationship = relationship
+                return field
+            return Field(List(_type), resolver=resolver)
 
     return Dynamic(dynamic_type)
 
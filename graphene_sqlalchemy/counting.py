@@ -0,0 +1,75 @@
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+
+from .cache import LRUCache
+
+
+def exact_count(query):
+    """Counts the rows of ``query`` with ``Query.count()``"""
+    return query.count()
+
+
+def get_bind_key(query):
+    """Returns a key identifying the database ``query`` runs on: the URL of
+    the engine its session binds it to, without password"""
+    if query.session is None:
+        return None
+    mapper = None
+    descriptions = query.column_descriptions
+    if descriptions and descriptions[0]["entity"] is not None:
+        mapper = sqlalchemyinspect(descriptions[0]["entity"]).mapper
+    bind = query.session.get_bind(mapper=mapper)
+    return repr(bind.engine.url)
+
+
+def get_query_cache_key(query):
+    """Returns a key identifying ``query`` across sessions: its database,
+    compiled SQL and parameters"""
+    compiled = query.statement.compile()
+    params = tuple(
+        (name, repr(value)) for name, value in sorted(compiled.params.items())
+    )
+    return get_bind_key(query), str(compiled), params
+
+
+class CachedCount(object):
+    """Count strategy caching the counts of the queries for ``ttl`` seconds.
+
+    The counts are keyed by the database (engine URL), compiled SQL and
+    parameters of the queries, in a LRU cache holding at most ``maxsize`` of
+    them. ``count`` is the strategy used on a cache miss.
+    """
+
+    def __init__(self, ttl=60, maxsize=1024, count=exact_count, cache=None):
+        self.count = count
+        self.cache = cache if cache is not None else LRUCache(maxsize, ttl)
+
+    def __call__(self, query):
+        key = get_query_cache_key(query)
+        count = self.cache.get(key)
+        if count is None:
+            count = self.count(query)
+            self.cache.set(key, count)
+        return count
+
+
+class EstimatedCount(object):
+    """Count strategy delegating to ``estimate``, a callable returning an
+    estimation of the number of rows of a query (for instance from the
+    planner statistics of the database).
+
+    The rows are counted exactly when the estimation is None, or below
+    ``exact_below``, as small results are cheap to count.
+    """
+
+    def __init__(self, estimate, exact_below=None, count=exact_count):
+        self.estimate = estimate
+        self.exact_below = exact_below
+        self.count = count
+
+    def __call__(self, query):
+        estimation = self.estimate(query)
+        if estimation is None or (
+            self.exact_below is not None and estimation < self.exact_below
+        ):
+            return self.count(query)
+        return estimation
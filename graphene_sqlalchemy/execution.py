@@ -0,0 +1,138 @@
+from __future__ import absolute_import
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from graphql.execution.executors.asyncio import AsyncioExecutor
+
+from .batching import _QUERY_POOL_KEY
+
+# Thread pool shared by the QueryPools created without one
+_default_executor = None
+_default_executor_lock = Lock()
+
+
+def get_default_executor(max_workers=4):
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ThreadPoolExecutor(max_workers)
+        return _default_executor
+
+
+class QueryPool(object):
+    """Runs the queries of a request in a thread pool, so that they don't
+    block the event loop of graphql-core's ``AsyncioExecutor``.
+
+    With a QueryPool in the context under ``query_pool``, connection fields,
+    ``get_node_batched`` and the batch loaders return awaitables of their
+    results, computed in ``executor`` (a bounded thread pool, shared by
+    default). Each query runs with its own session from ``session_factory``,
+    as sessions aren't thread-safe. Its transaction is ended once the query
+    is done, and the session is kept for the lazy loads of its instances
+    until ``close()``, to be called at the end of the request, which also
+    unbinds the pool from the sessions of the context.
+
+    ``limit`` caps the number of queries of the request running at once, on
+    top of the size of the thread pool shared by the requests.
+    """
+
+    def __init__(self, session_factory, executor=None, loop=None, limit=None):
+        self.session_factory = session_factory
+        self.executor = executor if executor is not None else get_default_executor()
+        self.loop = loop
+        self.limit = limit
+        self.sessions = []
+        # Sessions whose loaders run their queries in the pool
+        self.bound_sessions = []
+        self._lock = Lock()
+        self._semaphore = None
+
+    def bind(self, session):
+        """Makes the loaders of ``session`` run their queries in the pool,
+        until ``close()``"""
+        with self._lock:
+            if session.info.get(_QUERY_POOL_KEY) is self:
+                return
+            session.info[_QUERY_POOL_KEY] = self
+            self.bound_sessions.append(session)
+
+    def create_session(self):
+        session = self.session_factory()
+        self.bind(session)
+        with self._lock:
+            self.sessions.append(session)
+        return session
+
+    def call(self, fn, args):
+        session = self.create_session()
+        try:
+            result = fn(session, *args)
+        except Exception:
+            session.rollback()
+            raise
+        # Gives the connection back without expiring the loaded instances
+        session.expire_on_commit = False
+        session.commit()
+        return result
+
+    def run(self, fn, *args):
+        """Returns an asyncio future of ``fn(session, *args)``, run in the
+        thread pool with a new session."""
+        loop = self.loop if self.loop is not None else asyncio.get_event_loop()
+        if self.limit is None:
+            return self.submit(loop, fn, args)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return asyncio.ensure_future(self.run_limited(loop, fn, args), loop=loop)
+
+    def submit(self, loop, fn, args):
+        return asyncio.wrap_future(self.executor.submit(self.call, fn, args), loop=loop)
+
+    async def run_limited(self, loop, fn, args):
+        async with self._semaphore:
+            return await self.submit(loop, fn, args)
+
+    def close(self):
+        """Unbinds the pool from the sessions it was bound to, and closes
+        the sessions created for the request"""
+        with self._lock:
+            sessions, self.sessions = self.sessions, []
+            bound_sessions, self.bound_sessions = self.bound_sessions, []
+        for session in bound_sessions:
+            # Their later queries run in the calling thread again
+            if session.info.get(_QUERY_POOL_KEY) is self:
+                del session.info[_QUERY_POOL_KEY]
+        for session in sessions:
+            session.close()
+
+
+def execute_concurrently(schema, request_string, query_pool, **kwargs):
+    """Executes ``request_string`` on ``schema`` like ``Schema.execute()``,
+    on an event loop of its own, so that the queries of its fields run
+    concurrently in ``query_pool``: sibling root connection fields take as
+    long as the slowest of them rather than their sum. The sessions of the
+    pool, and the session of the context if it had none, are closed once
+    done."""
+    loop = asyncio.new_event_loop()
+    query_pool.loop = loop
+    context = dict(kwargs.pop("context_value", None) or {}, query_pool=query_pool)
+    if context.get("session") is None:
+        # Session of the loaders, whose queries run in the pool as well
+        context["session"] = query_pool.create_session()
+
+    async def execute():
+        return await schema.execute(
+            request_string,
+            context_value=context,
+            executor=AsyncioExecutor(loop),
+            return_promise=True,
+            **kwargs
+        )
+
+    try:
+        return loop.run_until_complete(execute())
+    finally:
+        query_pool.close()
+        loop.close()
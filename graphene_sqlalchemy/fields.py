@@ -1,15 +1,226 @@
 from functools import partial
 from promise import is_thenable, Promise
+from sqlalchemy import func
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.orm import load_only
 from sqlalchemy.orm.query import Query
 
-from graphene.relay import Connection, ConnectionField
+from graphene import ID, Field, List, NonNull
+from graphene.relay import Connection, ConnectionField, Node
 from graphene.relay.connection import PageInfo
-from graphql_relay.connection.arrayconnection import connection_from_list_slice
+from graphene.relay.node import NodeField as BaseNodeField
+from graphene.types.utils import get_type
+from graphql.execution.base import ResolveInfo
+from graphql_relay.connection.arrayconnection import (
+    connection_from_list_slice,
+    get_offset_with_default,
+    offset_to_cursor,
+)
 
-from .utils import get_query, sort_argument_for_model
+from .bakery import fetch_slice, get_sorted_baked_query
+from .batching import (
+    ConnectionPage,
+    get_connection_loader,
+    is_kept,
+    keep_identities,
+)
+from .counting import exact_count
+from .keyset import connection_from_keyset, get_keyset, nulls_sort_high
+from .memo import fetch_all, fetch_count, get_memo
+from .rows import get_row_class
+from .selection import (
+    collect_fields,
+    eager_load,
+    get_eager_load_options,
+    get_leaf_columns,
+    get_node_selection,
+    get_projected_columns,
+    has_projection,
+    load_selected_columns,
+    unwrap_type,
+)
+from .utils import (
+    get_query,
+    get_query_pool,
+    get_read_only_session,
+    get_session,
+    sort_argument_for_model,
+    supports_window_functions,
+)
+
+# Fields of a connection that can be resolved without knowing its length
+LENGTH_INDEPENDENT_FIELDS = ("edges", "pageInfo", "__typename")
+
+
+def connection_from_query(
+    query, args, connection_type, edge_type, pageinfo_type, fetch=None, memo=None
+):
+    """Returns the page of ``query`` selected by the relay ``args`` without
+    counting its rows. ``hasNextPage`` is derived from fetching one row more
+    than requested. It doesn't support ``last``, which needs the length.
+
+    ``fetch(start, end)`` returns the rows of the query in that range (a
+    slice of ``query`` by default, run once per ``memo``)."""
+    first = args.get("first")
+    after = args.get("after")
+    before = args.get("before")
+
+    start_offset = get_offset_with_default(after, -1) + 1
+    end_offset = get_offset_with_default(before, None)
+    if isinstance(first, int):
+        # Fetch one more row, if the page isn't capped by `before`
+        limit = start_offset + first + 1
+        end_offset = limit if end_offset is None else min(end_offset, limit)
+    if end_offset is not None and end_offset <= start_offset:
+        # Empty range, such as `before` not being after `after`
+        rows = []
+    elif fetch is None:
+        rows = fetch_all(query.slice(start_offset, end_offset), memo)
+    else:
+        rows = fetch(start_offset, end_offset)
+
+    has_next_page = isinstance(first, int) and len(rows) > first
+    if has_next_page:
+        rows = rows[:first]
+    return connection_from_page(
+        rows, start_offset, has_next_page, connection_type, edge_type, pageinfo_type
+    )
+
+
+def connection_from_page(
+    rows, start_offset, has_next_page, connection_type, edge_type, pageinfo_type
+):
+    """Returns the connection of a page of rows starting at ``start_offset``"""
+    edges = [
+        edge_type(node=node, cursor=offset_to_cursor(start_offset + i))
+        for i, node in enumerate(rows)
+    ]
+    return connection_type(
+        edges=edges,
+        page_info=pageinfo_type(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=False,
+            has_next_page=has_next_page,
+        ),
+    )
+
+
+class StreamedEdges(object):
+    """Edges of the rows ``start_offset`` to ``end_offset`` of ``query``,
+    fetched with ``yield_per(chunk_size)`` every time they are iterated.
+    Each edge is built when reached, so only about a chunk of rows is held
+    in memory at once while they are serialized."""
+
+    def __init__(self, query, start_offset, end_offset, edge_type, chunk_size):
+        self.query = query
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+        self.edge_type = edge_type
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        rows = self.query.slice(self.start_offset, self.end_offset).yield_per(
+            self.chunk_size
+        )
+        for i, node in enumerate(rows):
+            yield self.edge_type(
+                node=node, cursor=offset_to_cursor(self.start_offset + i)
+            )
+
+
+def slice_with_window_count(query, args, count=exact_count, memo=None):
+    """Fetches the page of ``query`` selected by the relay ``args`` along with
+    the total number of rows, computed by a ``COUNT(*) OVER ()`` window in the
+    same statement. Returns the offset of the page, its rows and the total.
+    It doesn't support ``last``, which needs the total to compute the page."""
+    start_offset = get_offset_with_default(args.get("after"), -1) + 1
+    end_offset = get_offset_with_default(args.get("before"), None)
+    first = args.get("first")
+    if isinstance(first, int):
+        limit = start_offset + first
+        end_offset = limit if end_offset is None else min(end_offset, limit)
+
+    if end_offset is not None and end_offset <= start_offset:
+        # Empty range, such as `first: 0`
+        rows = []
+    else:
+        rows = fetch_all(
+            query.add_columns(func.count().over().label("total_count")).slice(
+                start_offset, end_offset
+            ),
+            memo,
+        )
+    if rows:
+        total = rows[0][-1]
+    elif start_offset or end_offset is not None:
+        # The window isn't computed when the page is empty, which doesn't
+        # mean there are no rows if the range was limited
+        total = count(query)
+    else:
+        total = 0
+    return start_offset, [row[0] for row in rows], total
+
+
+def _is_inherited(cls, name, base):
+    """Returns whether the classmethod ``name`` of ``cls`` is the one of ``base``"""
+    return getattr(cls, name).__func__ is getattr(base, name).__func__
 
 
 class UnsortedSQLAlchemyConnectionField(ConnectionField):
+    """Connection field paginating the query of a SQLAlchemy model.
+
+    Its optimizations are disabled by default and enabled by setting these
+    class attributes in a subclass:
+
+    - ``keyset_pagination``: paginate with cursors encoding the values of the
+      sort columns (and the primary key) rather than offsets.
+    - ``window_count``: fetch the total along with the page, with a
+      ``COUNT(*) OVER ()`` window, instead of running a separate count query
+      (for databases supporting window functions).
+    - ``count_strategy``: callable returning the number of rows of a query,
+      used for the length of the connection. See the ``counting`` module for
+      the built-in ones.
+    - ``baked_queries``: fetch the pages of the default query of the field
+      with baked queries, only compiling their SQL once per shape (model,
+      selection and sort), with SQLAlchemy 1.3.
+    - ``result_cache``: ``ResultCache`` keeping the pages of the field across
+      requests.
+    - ``stream_chunk_size``: stream the pages in chunks of this many rows,
+      with ``yield_per()`` (and server-side cursors, where supported), rather
+      than loading them at once.
+    - ``keep_instances``: keep the instances of the pages, and of the batched
+      pages nested in them, alive in the session until the end of its
+      transaction, so that node lookups and many-to-one loads of the same
+      request find them in the identity map (for sessions scoped to the
+      request).
+    - ``leaf_rows``: fetch compact rows of the selected columns (see
+      ``rows.Row``) instead of ORM instances when the client only selects
+      columns of the nodes.
+    - ``memoize_queries``: run identical queries of the fields (same SQL,
+      parameters, entities and loader options) once per execution, as when
+      the same connection is selected under two aliases.
+    - ``read_only``: load the pages with a throwaway session sharing the
+      connection of the session of the request, so that their instances
+      aren't kept by its identity map.
+
+    ``relationship`` is the relationship resolved by the field, set by the
+    converter on the connections of relationships. Its children are then
+    paginated by the database rather than loaded in full.
+    """
+
+    keyset_pagination = False
+    window_count = False
+    count_strategy = staticmethod(exact_count)
+    baked_queries = False
+    result_cache = None
+    stream_chunk_size = None
+    keep_instances = False
+    leaf_rows = False
+    memoize_queries = False
+    read_only = False
+    relationship = None
+
     @property
     def type(self):
         from .types import SQLAlchemyObjectType
@@ -29,9 +240,19 @@ class UnsortedSQLAlchemyConnectionField(ConnectionField):
     def model(self):
         return self.type._meta.node._meta.model
 
+    @classmethod
+    def prepare_query(cls, query, info):
+        """Adds to ``query`` the options loading what the client selected
+        under the connection: eager loading and column projection."""
+        query = eager_load(query, info)
+        node_type, _ = get_node_selection(info, info.return_type, info.field_asts)
+        if has_projection(node_type):
+            query = load_selected_columns(query, info)
+        return query
+
     @classmethod
     def get_query(cls, model, info, sort=None, **args):
-        query = get_query(model, info.context)
+        query = cls.prepare_query(get_query(model, info.context), info)
         if sort is not None:
             if isinstance(sort, str):
                 query = query.order_by(sort.value)
@@ -39,20 +260,287 @@ class UnsortedSQLAlchemyConnectionField(ConnectionField):
                 query = query.order_by(*(col.value for col in sort))
         return query
 
+    @classmethod
+    def get_order_by(cls, relationship, sort=None):
+        if sort is not None:
+            if isinstance(sort, str):
+                sort = [sort]
+            order_by = [col.value for col in sort]
+        else:
+            order_by = list(relationship.order_by or ())
+        return order_by + list(relationship.mapper.primary_key)
+
+    @classmethod
+    def relationship_resolver(cls, relationship, root, info, **args):
+        """Resolves the children of ``root`` through ``relationship``.
+
+        Unless the collection is loaded already, a query of the children
+        built with ``with_parent()`` is returned, so that the page is sliced
+        with ``LIMIT``/``OFFSET`` and counted by the database.
+        """
+        state = sqlalchemyinspect(root)
+        session = state.session
+        if state.detached and info.context is not None:
+            # Loaded by a read-only field
+            session = get_session(info.context)
+        elif not state.persistent:
+            session = None
+        if relationship.key not in state.unloaded or session is None or state.modified:
+            # Already loaded, not persisted yet or pending changes: let the ORM decide
+            return getattr(root, relationship.key)
+        query = session.query(relationship.mapper.entity).with_parent(
+            root, relationship.key
+        )
+        return cls.prepare_query(query, info).order_by(
+            *cls.get_order_by(relationship, args.get("sort"))
+        )
+
+    @classmethod
+    def get_memo(cls, info):
+        """Returns the memo of the queries of the execution, or None without
+        ``memoize_queries``"""
+        if not cls.memoize_queries or info is None:
+            return None
+        return get_memo(info.context)
+
+    @classmethod
+    def count_rows(cls, query, memo=None):
+        """Returns the number of rows of ``query`` with ``count_strategy``,
+        counting identical queries once per ``memo``."""
+        return fetch_count(query, cls.count_strategy, memo)
+
+    @classmethod
+    def needs_length(cls, info):
+        """Returns whether the client selected fields of the connection
+        other than the ones known to not depend on its length (``edges``
+        and ``pageInfo``), such as a ``totalCount``."""
+        if info is None:
+            return True
+        selected = collect_fields(info, unwrap_type(info.return_type), info.field_asts)
+        return any(name not in LENGTH_INDEPENDENT_FIELDS for name in selected)
+
     @classmethod
     def resolve_connection(cls, connection_type, model, info, args, resolved):
+        if cls.can_stream(info, args, resolved):
+            return cls.resolve_streamed_connection(
+                connection_type, model, info, args, resolved
+            )
+        if cls.can_fetch_rows(info, resolved):
+            keys = get_leaf_columns(info)
+            if keys is not None:
+                return cls.resolve_rows_connection(
+                    connection_type, model, info, args, resolved, keys
+                )
+        if resolved is None:
+            if cls.can_bake(model, info, args):
+                connection = cls.resolve_baked_connection(
+                    connection_type, model, info, args
+                )
+                if connection is not None:
+                    return connection
+            resolved = cls.get_query(model, info, **args)
+        if cls.result_cache is not None and isinstance(resolved, Query):
+            return cls.resolve_cached_connection(
+                connection_type, model, info, args, resolved
+            )
+        return cls.paginate(connection_type, model, info, args, resolved)
+
+    @classmethod
+    def can_bake(cls, model, info, args):
+        """Returns whether the page of the default query of the field can be
+        fetched with a baked query, compiled once per shape of the query."""
+        return (
+            cls.baked_queries
+            and not cls.keyset_pagination
+            and not cls.window_count
+            and cls.result_cache is None
+            and not isinstance(args.get("last"), int)
+            and getattr(model, "query", None) is None
+            and get_session(info.context) is not None
+            and _is_inherited(cls, "get_query", UnsortedSQLAlchemyConnectionField)
+            and _is_inherited(cls, "prepare_query", UnsortedSQLAlchemyConnectionField)
+        )
+
+    @classmethod
+    def can_stream(cls, info, args, resolved):
+        """Returns whether the page can be streamed: paginated forward, and
+        without eagerly loaded relationships, which ``yield_per()`` doesn't
+        support."""
+        return (
+            cls.stream_chunk_size is not None
+            and not cls.keyset_pagination
+            and not cls.window_count
+            and cls.result_cache is None
+            and info is not None
+            and (resolved is None or isinstance(resolved, Query))
+            and not isinstance(args.get("last"), int)
+            and args.get("before") is None
+            and not get_eager_load_options(info)
+        )
+
+    @classmethod
+    def resolve_streamed_connection(cls, connection_type, model, info, args, resolved):
+        """Resolves the connection with ``StreamedEdges``. The page info and
+        the length, when selected, are derived from counting the rows."""
+        if resolved is None:
+            resolved = cls.get_query(model, info, **args)
+        first = args.get("first")
+        start_offset = get_offset_with_default(args.get("after"), -1) + 1
+        end_offset = start_offset + first if isinstance(first, int) else None
+
+        selected = collect_fields(info, unwrap_type(info.return_type), info.field_asts)
+        length = None
+        page_info = PageInfo(has_previous_page=False, has_next_page=False)
+        if "pageInfo" in selected or cls.needs_length(info):
+            length = cls.count_rows(resolved, cls.get_memo(info))
+            end = length if end_offset is None else min(end_offset, length)
+            if end > start_offset:
+                page_info.start_cursor = offset_to_cursor(start_offset)
+                page_info.end_cursor = offset_to_cursor(end - 1)
+            page_info.has_next_page = end_offset is not None and length > end_offset
+
+        connection = connection_type(
+            edges=StreamedEdges(
+                resolved,
+                start_offset,
+                end_offset,
+                connection_type.Edge,
+                cls.stream_chunk_size,
+            ),
+            page_info=page_info,
+        )
+        connection.iterable = resolved
+        connection.length = length
+        return connection
+
+    @classmethod
+    def can_fetch_rows(cls, info, resolved):
+        """Returns whether the page can be made of rows rather than ORM
+        instances, provided the client only selects columns."""
+        return (
+            cls.leaf_rows
+            and not cls.keyset_pagination
+            and not cls.window_count
+            and cls.result_cache is None
+            and info is not None
+            and (resolved is None or isinstance(resolved, Query))
+        )
+
+    @classmethod
+    def resolve_rows_connection(cls, connection_type, model, info, args, resolved, keys):
+        """Resolves the connection with the page of ``resolved`` (or of the
+        default query) restricted to the column attributes ``keys``, as
+        ``Row`` objects."""
         if resolved is None:
             resolved = cls.get_query(model, info, **args)
-        if isinstance(resolved, Query):
-            _len = resolved.count()
+        query = resolved.with_entities(*(getattr(model, key) for key in keys))
+        connection = cls.paginate(connection_type, model, info, args, query)
+        row_class = get_row_class(model, keys)
+        for edge in connection.edges:
+            edge.node = row_class(edge.node)
+        connection.iterable = resolved
+        return connection
+
+    @classmethod
+    def resolve_baked_connection(cls, connection_type, model, info, args):
+        """Resolves the connection of the default query of the field with a
+        baked query. Returns None if the query can't be baked."""
+        options = get_eager_load_options(info)
+        node_type, _ = get_node_selection(info, info.return_type, info.field_asts)
+        if has_projection(node_type):
+            columns = get_projected_columns(info)
+            if columns is not None:
+                options.append(load_only(*columns))
+        baked_query = get_sorted_baked_query(model, options, args.get("sort"))
+        if baked_query is None:
+            return None
+
+        session = get_session(info.context)
+        connection = connection_from_query(
+            None,
+            args,
+            connection_type=connection_type,
+            edge_type=connection_type.Edge,
+            pageinfo_type=PageInfo,
+            fetch=partial(fetch_slice, baked_query, session, memo=cls.get_memo(info)),
+        )
+        query = cls.get_query(model, info, **args)
+        connection.iterable = query
+        connection.length = None
+        if cls.needs_length(info):
+            connection.length = cls.count_rows(query, cls.get_memo(info))
+        return connection
+
+    @classmethod
+    def resolve_cached_connection(cls, connection_type, model, info, args, resolved):
+        cache = cls.result_cache
+        key = cache.get_key(
+            resolved,
+            info,
+            tuple(args.get(name) for name in ("first", "last", "after", "before")),
+            cls.keyset_pagination,
+            cls.needs_length(info),
+        )
+        cached = cache.get(key, resolved.session)
+        if cached is None:
+            connection = cls.paginate(connection_type, model, info, args, resolved)
+            cache.set(key, connection, resolved.session)
+            return connection
+        connection = connection_type(
+            edges=[
+                connection_type.Edge(node=node, cursor=cursor)
+                for node, cursor in zip(cached.rows, cached.cursors)
+            ],
+            page_info=PageInfo(**cached.page_info),
+        )
+        connection.iterable = resolved
+        connection.length = cached.length
+        return connection
+
+    @classmethod
+    def paginate(cls, connection_type, model, info, args, resolved):
+        """Returns the page of ``resolved``, a query or a list, selected by
+        the relay ``args``."""
+        if cls.keyset_pagination and isinstance(resolved, Query):
+            return cls.resolve_keyset_connection(
+                connection_type, model, info, args, resolved
+            )
+        is_query = isinstance(resolved, Query)
+        # Without `last`, the page doesn't depend on the length of the query
+        paginate_forward = is_query and not isinstance(args.get("last"), int)
+        needs_length = cls.needs_length(info)
+        memo = cls.get_memo(info)
+        if paginate_forward and needs_length and cls.window_count:
+            slice_start, list_slice, _len = slice_with_window_count(
+                resolved, args, partial(cls.count_rows, memo=memo), memo
+            )
+            list_slice_length = len(list_slice)
+        elif paginate_forward:
+            # Fetching the page without counting keeps it exact, even with
+            # an approximate count strategy
+            connection = connection_from_query(
+                resolved,
+                args,
+                connection_type=connection_type,
+                edge_type=connection_type.Edge,
+                pageinfo_type=PageInfo,
+                memo=memo,
+            )
+            connection.iterable = resolved
+            connection.length = cls.count_rows(resolved, memo) if needs_length else None
+            return connection
         else:
-            _len = len(resolved)
+            if is_query:
+                _len = cls.count_rows(resolved, memo)
+            else:
+                _len = len(resolved)
+            slice_start, list_slice, list_slice_length = 0, resolved, _len
         connection = connection_from_list_slice(
-            resolved,
+            list_slice,
             args,
-            slice_start=0,
+            slice_start=slice_start,
             list_length=_len,
-            list_slice_length=_len,
+            list_slice_length=list_slice_length,
             connection_type=connection_type,
             pageinfo_type=PageInfo,
             edge_type=connection_type.Edge,
@@ -61,18 +549,189 @@ class UnsortedSQLAlchemyConnectionField(ConnectionField):
         connection.length = _len
         return connection
 
+    @classmethod
+    def resolve_keyset_connection(cls, connection_type, model, info, args, resolved):
+        connection = connection_from_keyset(
+            resolved,
+            get_keyset(model, args.get("sort")),
+            args,
+            connection_type=connection_type,
+            edge_type=connection_type.Edge,
+            pageinfo_type=PageInfo,
+            nulls_high=nulls_sort_high(resolved, model),
+            memo=cls.get_memo(info),
+        )
+        connection.iterable = resolved
+        connection.length = (
+            cls.count_rows(resolved, cls.get_memo(info))
+            if cls.needs_length(info)
+            else None
+        )
+        return connection
+
+    @classmethod
+    def resolve_and_keep_connection(cls, connection_type, model, info, args, resolved):
+        connection = cls.resolve_connection(connection_type, model, info, args, resolved)
+        if cls.keep_instances and not isinstance(connection.edges, StreamedEdges):
+            # Later node and relationship lookups of the page find it in the
+            # session. Streamed pages are released as they are serialized.
+            keep_identities(edge.node for edge in connection.edges)
+        return connection
+
     @classmethod
     def connection_resolver(cls, resolver, connection_type, model, root, info, **args):
         resolved = resolver(root, info, **args)
 
-        on_resolve = partial(cls.resolve_connection, connection_type, model, info, args)
+        on_resolve = partial(
+            cls.resolve_and_keep_connection, connection_type, model, info, args
+        )
         if is_thenable(resolved):
             return Promise.resolve(resolved).then(on_resolve)
 
+        if resolved is None or isinstance(resolved, Query):
+            pool = get_query_pool(info.context)
+            if pool is not None:
+                return pool.run(
+                    cls.resolve_in_session, connection_type, model, info, args, resolved
+                )
+            if cls.read_only:
+                return cls.resolve_read_only_connection(
+                    connection_type, model, info, args, resolved
+                )
         return on_resolve(resolved)
 
+    @classmethod
+    def resolve_read_only_connection(cls, connection_type, model, info, args, resolved):
+        """Resolves the connection with a read-only session, closed once
+        the page is loaded. Its instances are then detached."""
+        session = None
+        if resolved is not None:
+            session = resolved.session
+        elif getattr(model, "query", None) is None:
+            session = get_session(info.context)
+        read_only_session = None
+        if session is not None:
+            read_only_session = get_read_only_session(session, model)
+        if read_only_session is None:
+            return cls.resolve_and_keep_connection(
+                connection_type, model, info, args, resolved
+            )
+        try:
+            return cls.resolve_in_session(
+                read_only_session, connection_type, model, info, args, resolved
+            )
+        finally:
+            read_only_session.close()
+
+    @classmethod
+    def resolve_in_session(cls, session, connection_type, model, info, args, resolved):
+        """Resolves the connection with ``session`` rather than the session
+        of the context: a session of the ``QueryPool`` of the request, or a
+        read-only session."""
+        info = ResolveInfo(
+            info.field_name,
+            info.field_asts,
+            info.return_type,
+            info.parent_type,
+            info.schema,
+            info.fragments,
+            info.root_value,
+            info.operation,
+            info.variable_values,
+            dict(info.context, session=session),
+            info.path,
+        )
+        if resolved is not None:
+            resolved = resolved.with_session(session)
+        return cls.resolve_and_keep_connection(
+            connection_type, model, info, args, resolved
+        )
+
     def get_resolver(self, parent_resolver):
-        return partial(self.connection_resolver, parent_resolver, self.type, self.model)
+        resolver = super(ConnectionField, self).get_resolver(parent_resolver)
+        if self.relationship is not None and self.resolver is None:
+            resolver = partial(self.relationship_resolver, self.relationship)
+        return partial(self.connection_resolver, resolver, self.type, self.model)
+
+
+class BatchSQLAlchemyConnectionField(UnsortedSQLAlchemyConnectionField):
+    """Connection field of a relationship, paginated for all the parents
+    resolved in the same tick with a single query.
+
+    The children are sorted by the ``order_by`` of the relationship, or by
+    their primary key. Pagination with ``last``, and databases without
+    window functions (MySQL before 8.0, SQLite before 3.25), fall back to
+    loading the query of each parent.
+    """
+
+    def __init__(self, type, relationship=None, *args, **kwargs):
+        self.relationship = relationship
+        super(BatchSQLAlchemyConnectionField, self).__init__(type, *args, **kwargs)
+
+    @classmethod
+    def relationship_resolver(cls, relationship, root, info, **args):
+        state = sqlalchemyinspect(root)
+        if (
+            relationship.key not in state.unloaded
+            or not state.persistent
+            or state.modified
+            or isinstance(args.get("last"), int)
+            or not supports_window_functions(
+                state.session.get_bind(mapper=relationship.mapper).dialect
+            )
+        ):
+            return super(BatchSQLAlchemyConnectionField, cls).relationship_resolver(
+                relationship, root, info, **args
+            )
+
+        first = args.get("first")
+        start_offset = get_offset_with_default(args.get("after"), -1) + 1
+        before_offset = get_offset_with_default(args.get("before"), None)
+        end_offset = before_offset
+        if isinstance(first, int):
+            end_offset = start_offset + first
+            if before_offset is not None:
+                end_offset = min(end_offset, before_offset)
+        loader = get_connection_loader(
+            state.session,
+            relationship,
+            start_offset,
+            end_offset,
+            cls.get_order_by(relationship, args.get("sort")),
+            cls.needs_length(info),
+            # The pages nested in a kept page are kept as well
+            cls.keep_instances or is_kept(state),
+        )
+
+        def on_load(page):
+            # The row after the page is only relevant when paginating forward
+            # and not beyond `before`
+            has_next_page = (
+                page.has_next_page
+                and isinstance(first, int)
+                and (before_offset is None or end_offset < before_offset)
+            )
+            return page._replace(has_next_page=has_next_page)
+
+        return loader.load(root).then(on_load)
+
+    @classmethod
+    def resolve_connection(cls, connection_type, model, info, args, resolved):
+        if not isinstance(resolved, ConnectionPage):
+            return super(BatchSQLAlchemyConnectionField, cls).resolve_connection(
+                connection_type, model, info, args, resolved
+            )
+        connection = connection_from_page(
+            resolved.rows,
+            resolved.start_offset,
+            resolved.has_next_page,
+            connection_type=connection_type,
+            edge_type=connection_type.Edge,
+            pageinfo_type=PageInfo,
+        )
+        connection.iterable = resolved.rows
+        connection.length = resolved.length
+        return connection
 
 
 class SQLAlchemyConnectionField(UnsortedSQLAlchemyConnectionField):
@@ -94,6 +753,70 @@ class SQLAlchemyConnectionField(UnsortedSQLAlchemyConnectionField):
         super(SQLAlchemyConnectionField, self).__init__(type, *args, **kwargs)
 
 
+def get_node_from_global_id(node_type, info, global_id, only_type=None):
+    """Like ``node_type.get_node_from_global_id``, fetching the nodes of the
+    types having a ``get_node_batched`` method (SQLAlchemyObjectTypes) with
+    it."""
+    try:
+        _type, _id = node_type.from_global_id(global_id)
+        graphene_type = info.schema.get_type(_type).graphene_type
+    except Exception:
+        return None
+    get_node_batched = getattr(graphene_type, "get_node_batched", None)
+    if (
+        get_node_batched is None
+        or node_type not in graphene_type._meta.interfaces
+        or (only_type and graphene_type != only_type)
+    ):
+        return node_type.get_node_from_global_id(info, global_id, only_type=only_type)
+    return get_node_batched(info, _id)
+
+
+class NodeField(BaseNodeField):
+    """Field fetching a node from its global id, like ``Node.Field()``.
+
+    The ids of SQLAlchemyObjectTypes requested during the same tick are
+    fetched in batch, with one query per type.
+    """
+
+    def __init__(self, node=Node, type=False, **kwargs):
+        super(NodeField, self).__init__(node, type, **kwargs)
+
+    @classmethod
+    def node_resolver(cls, node_type, only_type, root, info, id):
+        return get_node_from_global_id(node_type, info, id, only_type=only_type)
+
+    def get_resolver(self, parent_resolver):
+        return partial(self.node_resolver, self.node_type, get_type(self.field_type))
+
+
+class NodesField(Field):
+    """Field fetching a list of nodes from their global ids, such as
+    ``nodes(ids: [ID!]!): [Node]``.
+
+    The ids of SQLAlchemyObjectTypes are fetched in batch, with one query
+    per type. Unknown ids resolve to null.
+    """
+
+    def __init__(self, node=Node, type=None, **kwargs):
+        assert issubclass(node, Node), "NodesField can only operate in Nodes"
+        self.node_type = node
+        super(NodesField, self).__init__(
+            List(type or node),
+            ids=List(NonNull(ID), required=True, description="The IDs of the objects"),
+            **kwargs
+        )
+
+    @classmethod
+    def nodes_resolver(cls, node_type, root, info, ids):
+        return Promise.all(
+            [get_node_from_global_id(node_type, info, global_id) for global_id in ids]
+        )
+
+    def get_resolver(self, parent_resolver):
+        return partial(self.nodes_resolver, self.node_type)
+
+
 __connectionFactory = UnsortedSQLAlchemyConnectionField
 
 
@@ -101,6 +824,22 @@ def createConnectionField(_type):
     return __connectionFactory(_type)
 
 
+def createBatchConnectionField(_type, relationship):
+    """Returns the connection field of ``relationship`` for a type with
+    batching. A registered factory must return a BatchSQLAlchemyConnectionField,
+    whose pages would otherwise not be batched."""
+    if __connectionFactory is UnsortedSQLAlchemyConnectionField:
+        return BatchSQLAlchemyConnectionField(_type, relationship)
+    field = __connectionFactory(_type)
+    if not isinstance(field, BatchSQLAlchemyConnectionField):
+        raise Exception(
+            "The connection field factory must return a BatchSQLAlchemyConnectionField "
+            'for the relationships of types with batching, received "{}".'.format(field)
+        )
+    field.relationship = relationship
+    return field
+
+
 def registerConnectionFieldFactory(factoryMethod):
     global __connectionFactory
     __connectionFactory = factoryMethod
@@ -0,0 +1,265 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from graphql_relay.utils import base64, unbase64
+from sqlalchemy import and_, bindparam, or_, tuple_
+from sqlalchemy.exc import UnboundExecutionError
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+
+from .memo import fetch_all
+
+PREFIX = "keyset:"
+
+# Dialects sorting NULL after every value in ascending order, the others
+# sorting it before
+NULLS_HIGH_DIALECTS = ("oracle", "postgresql")
+
+
+def _sort_key(clause):
+    """Returns the ``(expression, descending)`` pair of an ORDER BY clause"""
+    if isinstance(clause, UnaryExpression):
+        if clause.modifier is operators.desc_op:
+            return clause.element, True
+        if clause.modifier is operators.asc_op:
+            return clause.element, False
+    return clause, False
+
+
+def get_keyset(model, sort=None):
+    """Returns the ``(expression, descending)`` pairs the keyset of a
+    connection is made of: the ``sort`` clauses, followed by the primary
+    key columns not already sorted on, so that the keyset is unique."""
+    if sort is None:
+        sort = []
+    elif isinstance(sort, str):
+        sort = [sort]
+    keyset = [_sort_key(getattr(item, "value", item)) for item in sort]
+    for column in sqlalchemyinspect(model).primary_key:
+        if not any(expression is column for expression, _ in keyset):
+            keyset.append((column, False))
+    return keyset
+
+
+def nulls_sort_high(query, model):
+    """Returns whether the database of ``query`` sorts NULL after every
+    value in ascending order"""
+    try:
+        bind = query.session.get_bind(mapper=model)
+    except UnboundExecutionError:
+        return False
+    return bind.dialect.name in NULLS_HIGH_DIALECTS
+
+
+def _nullable(expression):
+    return getattr(expression, "nullable", True)
+
+
+def _python_type(expression):
+    try:
+        return expression.type.python_type
+    except (AttributeError, NotImplementedError):
+        return None
+
+
+def _parse_datetime(value):
+    fromisoformat = getattr(datetime, "fromisoformat", None)
+    if fromisoformat is not None:
+        return fromisoformat(value)
+    for format in ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(value, format)
+        except ValueError:
+            pass
+    raise ValueError("Invalid datetime {!r}".format(value))
+
+
+def _encode_value(expression, value):
+    if value is None:
+        return None
+    if getattr(expression.type, "enum_class", None) is not None:
+        return value.name
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _decode_value(expression, value):
+    if value is None:
+        return None
+    enum_class = getattr(expression.type, "enum_class", None)
+    if enum_class is not None:
+        return enum_class[value]
+    python_type = _python_type(expression)
+    if python_type is datetime:
+        return _parse_datetime(value)
+    if python_type is date:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    if python_type is time:
+        return _parse_datetime("1970-01-01T" + value).time()
+    if python_type is Decimal:
+        return Decimal(value)
+    return value
+
+
+def keyset_to_cursor(keyset, values):
+    """Creates the cursor string from the values of the keyset of a row"""
+    encoded = [
+        _encode_value(expression, value)
+        for (expression, _), value in zip(keyset, values)
+    ]
+    return base64(PREFIX + json.dumps(encoded, separators=(",", ":"), default=str))
+
+
+def cursor_to_keyset(keyset, cursor):
+    """Rederives the values of the keyset from the cursor string"""
+    values = None
+    try:
+        decoded = unbase64(cursor)
+        if decoded.startswith(PREFIX):
+            values = json.loads(decoded[len(PREFIX):])
+        if isinstance(values, list) and len(values) == len(keyset):
+            return [
+                _decode_value(expression, value)
+                for (expression, _), value in zip(keyset, values)
+            ]
+    except Exception:
+        pass
+    raise Exception('Invalid cursor "{}".'.format(cursor))
+
+
+def keyset_filter(keyset, values, forward=True, nulls_high=False):
+    """Returns the clause selecting the rows after (or before, if not
+    ``forward``) the row with the given keyset ``values``.
+
+    When every expression is sorted in the same direction and can't be
+    NULL, a row value comparison ``(a, b) > (:a, :b)`` is used, so that an
+    index on the sorted columns can serve it. Otherwise the comparison is
+    expanded to ``a > :a OR (a = :a AND b > :b)``, with ``IS NULL`` branches
+    placing NULL where the database sorts it (after every value if
+    ``nulls_high``, before otherwise).
+    """
+    params = [
+        bindparam(None, value, type_=expression.type)
+        for (expression, _), value in zip(keyset, values)
+    ]
+    greater = [descending != forward for _, descending in keyset]
+    # Whether the NULLs of each expression come after its values in the
+    # direction of the page
+    nulls_after = [
+        _nullable(expression) and is_greater == nulls_high
+        for (expression, _), is_greater in zip(keyset, greater)
+    ]
+    if len(set(greater)) == 1 and None not in values and not any(nulls_after):
+        left = tuple_(*(expression for expression, _ in keyset))
+        right = tuple_(*params)
+        if len(keyset) == 1:
+            left, right = keyset[0][0], params[0]
+        return left > right if greater[0] else left < right
+
+    equal = []
+    clauses = []
+    for i, ((expression, _), value, param) in enumerate(zip(keyset, values, params)):
+        if value is None:
+            # Either every value comes after NULL or none does
+            if not nulls_after[i]:
+                clauses.append(and_(*(equal + [expression.isnot(None)])))
+            equal.append(expression.is_(None))
+            continue
+        compare = expression > param if greater[i] else expression < param
+        if nulls_after[i]:
+            compare = or_(compare, expression.is_(None))
+        clauses.append(and_(*(equal + [compare])))
+        equal.append(expression == param)
+    return or_(*clauses)
+
+
+def keyset_order_by(keyset, forward=True):
+    return [
+        expression.desc() if descending == forward else expression.asc()
+        for expression, descending in keyset
+    ]
+
+
+def connection_from_keyset(
+    query,
+    keyset,
+    args,
+    connection_type,
+    edge_type,
+    pageinfo_type,
+    nulls_high=False,
+    memo=None,
+):
+    """Returns the page of ``query`` selected by the relay ``args``, paginating
+    with the keyset encoded in the cursors instead of offsets.
+
+    Only the rows of the page (plus one, to know if there are more) are
+    fetched, so the cost of a page doesn't depend on how deep it is.
+    ``nulls_high`` tells where the database sorts NULL, see ``keyset_filter``.
+    Identical queries run once per ``memo``, see ``memo.fetch_all``.
+    """
+    first = args.get("first")
+    last = args.get("last")
+    after = args.get("after")
+    before = args.get("before")
+    # Paginate backwards when only the last rows are requested
+    forward = not (isinstance(last, int) and not isinstance(first, int))
+
+    query = query.order_by(None).order_by(*keyset_order_by(keyset, forward))
+    if after:
+        query = query.filter(
+            keyset_filter(
+                keyset, cursor_to_keyset(keyset, after), nulls_high=nulls_high
+            )
+        )
+    if before:
+        query = query.filter(
+            keyset_filter(
+                keyset,
+                cursor_to_keyset(keyset, before),
+                forward=False,
+                nulls_high=nulls_high,
+            )
+        )
+    query = query.add_columns(
+        *(
+            expression.label("keyset_{}".format(i))
+            for i, (expression, _) in enumerate(keyset)
+        )
+    )
+
+    has_previous_page = has_next_page = False
+    limit = first if forward else last
+    if isinstance(limit, int):
+        rows = fetch_all(query.limit(limit + 1), memo)
+        if forward:
+            has_next_page = len(rows) > limit
+        else:
+            has_previous_page = len(rows) > limit
+        rows = rows[:limit]
+    else:
+        rows = fetch_all(query, memo)
+    if not forward:
+        rows.reverse()
+    elif isinstance(last, int):
+        has_previous_page = len(rows) > last
+        rows = rows[max(len(rows) - last, 0):]
+
+    edges = [
+        edge_type(node=row[0], cursor=keyset_to_cursor(keyset, row[1:]))
+        for row in rows
+    ]
+    return connection_type(
+        edges=edges,
+        page_info=pageinfo_type(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page,
+        ),
+    )
@@ -0,0 +1,111 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .utils import on_transaction_end
+
+# Key under which the results of the queries run during an execution are
+# stored in its context
+_MEMO_KEY = "graphene_sqlalchemy.memo"
+# Key under which a token of the current state of a session is stored in
+# ``Session.info``. It's replaced whenever the session changes, so that the
+# results memoized before aren't served anymore.
+_STATE_KEY = "graphene_sqlalchemy.memo_state"
+
+
+def get_memo(context):
+    """Returns the memo of the execution of ``context``, a dict, or None
+    without context"""
+    if context is None:
+        return None
+    return context.setdefault(_MEMO_KEY, {})
+
+
+def get_session_state(session):
+    return session.info.setdefault(_STATE_KEY, object())
+
+
+def clear_memo(session):
+    """Forgets the results memoized for ``session``. It is done on every
+    flush, at the end of every transaction (also ended by ``close()``) and
+    on rollback, but not on statements run directly with
+    ``Session.execute()``."""
+    session.info.pop(_STATE_KEY, None)
+
+
+def memoize_key(memo, session, key, fetch):
+    """Returns ``fetch()``, computed once per ``memo`` for a given ``key``
+    until ``session`` changes. Without ``memo``, ``fetch()`` is always
+    called."""
+    if memo is None or session.new or session.dirty or session.deleted:
+        # The pending changes will be flushed by the query
+        return fetch()
+    state = get_session_state(session)
+    entry = memo.get(key)
+    if entry is not None and entry[0] is state:
+        return entry[1]
+    result = fetch()
+    memo[key] = (state, result)
+    return result
+
+
+def get_memo_key(query):
+    """Returns a key identifying the results of ``query``: its compiled SQL
+    and parameters, its entities and its loader options. The options are
+    compared by identity, so queries with options only share results when
+    they are built with the same option objects."""
+    compiled = query.statement.compile()
+    return (
+        str(compiled),
+        tuple((name, repr(value)) for name, value in sorted(compiled.params.items())),
+        tuple(
+            (description["name"], description["entity"], description["aliased"])
+            for description in query.column_descriptions
+        ),
+        tuple(query._with_options),
+    )
+
+
+def fetch_all(query, memo=None):
+    """Returns the rows of ``query``, only running it once per ``memo`` for
+    identical queries (see ``get_memo_key``) until the session changes.
+    They are fetched by iterating the query, which ``Query.all()`` doesn't
+    do with SQLAlchemy 1.4."""
+    if memo is None:
+        return list(query)
+    rows = memoize_key(memo, query.session, get_memo_key(query), lambda: list(query))
+    # Copied, as the callers may modify the list
+    return list(rows)
+
+
+def fetch_count(query, count, memo=None):
+    """Returns the number of rows of ``query`` according to the ``count``
+    strategy, only counting identical queries once per ``memo`` until the
+    session changes, like ``fetch_all``."""
+    if memo is None:
+        return count(query)
+    return memoize_key(
+        memo, query.session, (count,) + get_memo_key(query), lambda: count(query)
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    clear_memo(session)
+
+
+on_transaction_end(clear_memo)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_soft_rollback(session, previous_transaction):
+    clear_memo(session)
+
+
+@event.listens_for(Session, "after_bulk_update")
+def _after_bulk_update(update_context):
+    clear_memo(update_context.session)
+
+
+@event.listens_for(Session, "after_bulk_delete")
+def _after_bulk_delete(delete_context):
+    clear_memo(delete_context.session)
@@ -0,0 +1,213 @@
+from collections import namedtuple
+from threading import Lock
+
+from sqlalchemy import Table, event
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
+from sqlalchemy.sql.util import find_tables
+
+from .cache import LRUCache
+from .counting import get_query_cache_key
+from .utils import on_transaction_end
+
+# Version of every table, bumped when rows of the table change. The versions
+# of the tables of a query are part of its cache key, so that changes make
+# the entries depending on them unreachable.
+_TABLE_VERSIONS = {}
+_TABLE_VERSIONS_LOCK = Lock()
+# Key under which the tables changed by the flushes of the current
+# transaction are stored in ``Session.info``
+_CHANGED_TABLES_KEY = "graphene_sqlalchemy.changed_tables"
+# Whether a ResultCache was created, so that the session events only track
+# the changed tables when it is useful
+_ENABLED = False
+
+
+def get_tables(query):
+    """Returns the tables ``query`` reads from, sorted by name"""
+    statement = query.statement
+    selectables = [statement]
+    if hasattr(statement, "get_final_froms"):
+        # SQLAlchemy 1.4 only adds the joins of the query to its statement
+        # when compiled
+        selectables.extend(statement.get_final_froms())
+    tables = set(
+        table
+        for selectable in selectables
+        for table in find_tables(selectable)
+        if isinstance(table, Table)
+    )
+    return sorted(tables, key=lambda table: table.fullname)
+
+
+def get_table_versions(tables):
+    return tuple(_TABLE_VERSIONS.get(table, 0) for table in tables)
+
+
+def invalidate_tables(tables):
+    """Invalidates the cached results read from any of ``tables``"""
+    with _TABLE_VERSIONS_LOCK:
+        for table in tables:
+            _TABLE_VERSIONS[table] = _TABLE_VERSIONS.get(table, 0) + 1
+
+
+def get_mapper_tables(mapper):
+    """Returns the tables changed when instances of ``mapper`` change: the
+    tables it is mapped to and the secondary tables of its relationships."""
+    tables = set(mapper.tables)
+    for relationship in mapper.relationships:
+        if relationship.secondary is not None:
+            tables.update(
+                table
+                for table in find_tables(relationship.secondary)
+                if isinstance(table, Table)
+            )
+    return tables
+
+
+def snapshot_instance(instance):
+    """Returns the class and the loaded column values of ``instance``"""
+    state = sqlalchemyinspect(instance)
+    values = dict(
+        (prop.key, state.dict[prop.key])
+        for prop in state.mapper.column_attrs
+        if prop.key in state.dict
+    )
+    return state.class_, values
+
+
+def restore_instance(session, class_, values):
+    """Returns the instance of ``class_`` with the given column values in
+    ``session``: the one of the identity map if present, else a new
+    persistent instance. Its other attributes are loaded on access."""
+    mapper = sqlalchemyinspect(class_)
+    identity_key = mapper.identity_key_from_primary_key(
+        [values[mapper.get_property_by_column(column).key] for column in mapper.primary_key]
+    )
+    instance = session.identity_map.get(identity_key)
+    if instance is None:
+        instance = mapper.class_manager.new_instance()
+        for key, value in values.items():
+            set_committed_value(instance, key, value)
+        make_transient_to_detached(instance)
+        session.add(instance)
+    return instance
+
+
+# A connection as stored in the cache: the class and column values of its
+# rows, their cursors, the fields of its PageInfo and its length
+CachedConnection = namedtuple(
+    "CachedConnection", ["rows", "cursors", "page_info", "length"]
+)
+
+
+class ResultCache(object):
+    """Cache of the pages of connection queries, shared across requests.
+
+    The pages are keyed by the database, compiled SQL and parameters of the
+    query (its filters and sort), the pagination arguments and the versions of
+    the tables the query reads from. Flushes and commits changing rows of a
+    table, through any session of the process, invalidate the pages read
+    from it.
+
+    ``backend`` stores the entries: any object with the ``get(key)`` and
+    ``set(key, value)`` methods of ``LRUCache``, which is used by default
+    with ``maxsize`` entries expiring after ``ttl`` seconds. Entries only
+    hold plain column values.
+
+    The database is identified by the URL of the engine. ``key_prefix(info)``,
+    if given, returns another part of the key, for what the URL doesn't tell
+    apart, such as a schema per tenant.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, backend=None, key_prefix=None):
+        global _ENABLED
+        _ENABLED = True
+        self.backend = backend if backend is not None else LRUCache(maxsize, ttl)
+        self.key_prefix = key_prefix
+
+    def get_key(self, query, info, *args):
+        return (
+            self.key_prefix(info) if self.key_prefix is not None else None,
+            get_query_cache_key(query),
+            args,
+            get_table_versions(get_tables(query)),
+        )
+
+    def get(self, key, session):
+        """Returns the rows, cursors, page info fields and length of the
+        cached connection, with the rows restored in ``session``, or None."""
+        cached = self.backend.get(key)
+        if cached is None:
+            return None
+        rows = [restore_instance(session, class_, values) for class_, values in cached.rows]
+        return cached._replace(rows=rows)
+
+    def set(self, key, connection, session):
+        """Stores ``connection``, read by ``session``, unless the session
+        changed tables in its transaction: its page could show rows other
+        sessions can't see yet, or ever."""
+        if session.info.get(_CHANGED_TABLES_KEY):
+            return
+        page_info = connection.page_info
+        self.backend.set(
+            key,
+            CachedConnection(
+                rows=[snapshot_instance(edge.node) for edge in connection.edges],
+                cursors=[edge.cursor for edge in connection.edges],
+                page_info=dict(
+                    start_cursor=page_info.start_cursor,
+                    end_cursor=page_info.end_cursor,
+                    has_previous_page=page_info.has_previous_page,
+                    has_next_page=page_info.has_next_page,
+                ),
+                length=connection.length,
+            ),
+        )
+
+
+def _get_changed_tables(session):
+    tables = set()
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        tables.update(get_mapper_tables(sqlalchemyinspect(instance).mapper))
+    return tables
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    if not _ENABLED:
+        return
+    tables = _get_changed_tables(session)
+    if tables:
+        invalidate_tables(tables)
+        session.info.setdefault(_CHANGED_TABLES_KEY, set()).update(tables)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    # The pages cached from the committed state between the flush and the
+    # commit are stale as well
+    tables = session.info.pop(_CHANGED_TABLES_KEY, None)
+    if tables:
+        invalidate_tables(tables)
+
+
+@on_transaction_end
+def _after_transaction_end(session):
+    # Rolled back: the pages cached with the changes are stale
+    tables = session.info.pop(_CHANGED_TABLES_KEY, None)
+    if tables:
+        invalidate_tables(tables)
+
+
+def _after_bulk_operation(context):
+    if _ENABLED:
+        tables = get_mapper_tables(context.mapper)
+        invalidate_tables(tables)
+        context.session.info.setdefault(_CHANGED_TABLES_KEY, set()).update(tables)
+
+
+event.listen(Session, "after_bulk_update", _after_bulk_operation)
+event.listen(Session, "after_bulk_delete", _after_bulk_operation)
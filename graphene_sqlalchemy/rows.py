@@ -0,0 +1,33 @@
+class Row(object):
+    """Compact stand-in for an instance of a model with only some of its
+    column attributes, used by connections whose nodes only select columns.
+    Rows of a model are accepted by the types of the model."""
+
+    __slots__ = ()
+    # The model the row stands for
+    _model = None
+
+    def __init__(self, values):
+        for key, value in zip(self.__slots__, values):
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return "<{} {}>".format(
+            type(self).__name__,
+            ", ".join("{}={!r}".format(key, getattr(self, key)) for key in self.__slots__),
+        )
+
+
+# Row classes by model and column keys
+_ROW_CLASSES = {}
+
+
+def get_row_class(model, keys):
+    """Returns the ``Row`` class of ``model`` with the attributes ``keys``"""
+    keys = tuple(keys)
+    row_class = _ROW_CLASSES.get((model, keys))
+    if row_class is None:
+        row_class = _ROW_CLASSES[(model, keys)] = type(
+            "{}Row".format(model.__name__), (Row,), {"__slots__": keys, "_model": model}
+        )
+    return row_class
@@ -0,0 +1,273 @@
+from collections import OrderedDict
+
+from graphene.relay import Connection
+from graphene.utils.str_converters import to_camel_case
+from graphql.language import ast
+from graphql.type import GraphQLList, GraphQLNonNull
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.orm import (
+    ColumnProperty,
+    CompositeProperty,
+    RelationshipProperty,
+    joinedload,
+    load_only,
+    selectinload,
+)
+from sqlalchemy.orm.exc import UnmappedColumnError
+
+
+def unwrap_type(gql_type):
+    while isinstance(gql_type, (GraphQLList, GraphQLNonNull)):
+        gql_type = gql_type.of_type
+    return gql_type
+
+
+def _fragment_applies(fragment, gql_type):
+    condition = fragment.type_condition
+    if condition is None:
+        return True
+    name = condition.name.value
+    return name == gql_type.name or any(
+        interface.name == name for interface in getattr(gql_type, "interfaces", ())
+    )
+
+
+def _collect_fields(info, gql_type, selection_sets, fields):
+    for selection_set in selection_sets:
+        if selection_set is None:
+            continue
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                fields.setdefault(selection.name.value, []).append(selection)
+            elif isinstance(selection, ast.InlineFragment):
+                if _fragment_applies(selection, gql_type):
+                    _collect_fields(info, gql_type, [selection.selection_set], fields)
+            elif isinstance(selection, ast.FragmentSpread):
+                fragment = info.fragments[selection.name.value]
+                if _fragment_applies(fragment, gql_type):
+                    _collect_fields(info, gql_type, [fragment.selection_set], fields)
+    return fields
+
+
+def collect_fields(info, gql_type, field_asts):
+    """Returns the fields selected on ``gql_type`` by ``field_asts``, following
+    fragments, as an OrderedDict of field name to the list of their ASTs.
+    Aliases of a same field are merged together."""
+    return _collect_fields(
+        info,
+        gql_type,
+        [field_ast.selection_set for field_ast in field_asts],
+        OrderedDict(),
+    )
+
+
+def is_connection_type(gql_type):
+    graphene_type = getattr(gql_type, "graphene_type", None)
+    return isinstance(graphene_type, type) and issubclass(graphene_type, Connection)
+
+
+def get_node_selection(info, gql_type, field_asts):
+    """Returns the object type and the field ASTs of the nodes selected by
+    ``field_asts``, going through ``edges { node }`` for connections."""
+    gql_type = unwrap_type(gql_type)
+    if not is_connection_type(gql_type):
+        return gql_type, field_asts
+    edges = collect_fields(info, gql_type, field_asts).get("edges", [])
+    edge_type = unwrap_type(gql_type.fields["edges"].type)
+    nodes = collect_fields(info, edge_type, edges).get("node", [])
+    return unwrap_type(edge_type.fields["node"].type), nodes
+
+
+# Cache of the GraphQL field names to graphene field names mapping
+_FIELD_NAMES_CACHE = {}
+
+
+def get_field_names(graphene_type, auto_camelcase=True):
+    key = (graphene_type, auto_camelcase)
+    names = _FIELD_NAMES_CACHE.get(key)
+    if names is None:
+        names = {}
+        for name, field in graphene_type._meta.fields.items():
+            gql_name = getattr(field, "name", None)
+            if not gql_name:
+                gql_name = to_camel_case(name) if auto_camelcase else name
+            names[gql_name] = name
+        _FIELD_NAMES_CACHE[key] = names
+    return names
+
+
+def get_selected_fields(info, gql_type, field_asts):
+    """Returns the graphene field names selected on an SQLAlchemyObjectType,
+    paired with their GraphQL definition and ASTs."""
+    graphene_type = gql_type.graphene_type
+    names = get_field_names(
+        graphene_type, getattr(info.schema, "auto_camelcase", True)
+    )
+    for gql_name, asts in collect_fields(info, gql_type, field_asts).items():
+        name = names.get(gql_name)
+        if name is not None:
+            yield name, gql_type.fields[gql_name], asts
+
+
+def _get_model(gql_type):
+    graphene_type = getattr(gql_type, "graphene_type", None)
+    meta = getattr(graphene_type, "_meta", None)
+    return getattr(meta, "model", None)
+
+
+def has_projection(gql_type):
+    graphene_type = getattr(gql_type, "graphene_type", None)
+    return getattr(getattr(graphene_type, "_meta", None), "projection", False)
+
+
+def _column_keys(mapper, columns):
+    for column in columns:
+        try:
+            yield mapper.get_property_by_column(column).key
+        except UnmappedColumnError:
+            pass
+
+
+def get_selected_columns(info, gql_type, field_asts):
+    """Returns the keys of the column attributes needed to resolve the fields
+    selected on ``gql_type``.
+
+    The primary key is always included (``resolve_id`` and the loaders need
+    it), as well as the local columns of the selected relationships.
+    """
+    mapper = sqlalchemyinspect(_get_model(gql_type))
+    keys = list(_column_keys(mapper, mapper.primary_key))
+    for name, _, _ in get_selected_fields(info, gql_type, field_asts):
+        prop = mapper.attrs.get(name)
+        if isinstance(prop, ColumnProperty):
+            keys.append(prop.key)
+        elif isinstance(prop, CompositeProperty):
+            keys.extend(_column_keys(mapper, prop.columns))
+        elif isinstance(prop, RelationshipProperty):
+            keys.extend(_column_keys(mapper, prop.local_columns))
+    return list(OrderedDict.fromkeys(keys))
+
+
+def get_leaf_columns(info):
+    """Returns the keys of the column attributes read by the fields selected
+    on the nodes returned by the field being resolved, primary key first, or
+    None if a selected field needs more than columns: a relationship,
+    composite, hybrid property, or a field with a resolver of its own."""
+    gql_type, field_asts = get_node_selection(info, info.return_type, info.field_asts)
+    model = _get_model(gql_type)
+    if model is None:
+        return None
+    graphene_type = gql_type.graphene_type
+    names = get_field_names(
+        graphene_type, getattr(info.schema, "auto_camelcase", True)
+    )
+    mapper = sqlalchemyinspect(model)
+    keys = list(_column_keys(mapper, mapper.primary_key))
+    for gql_name in collect_fields(info, gql_type, field_asts):
+        if gql_name == "__typename":
+            continue
+        name = names.get(gql_name)
+        if name is None:
+            return None
+        if name == graphene_type._meta.id:
+            # resolve_id only reads the primary key
+            continue
+        field = graphene_type._meta.fields[name]
+        if getattr(field, "resolver", None) is not None or getattr(
+            graphene_type, "resolve_{}".format(name), None
+        ):
+            return None
+        prop = mapper.attrs.get(name)
+        if not isinstance(prop, ColumnProperty):
+            return None
+        keys.append(prop.key)
+    return list(OrderedDict.fromkeys(keys))
+
+
+def _eager_load_options(info, gql_type, field_asts, parent_option):
+    model = _get_model(gql_type)
+    if model is None:
+        return
+    relationships = sqlalchemyinspect(model).relationships
+    for name, gql_field, asts in get_selected_fields(info, gql_type, field_asts):
+        relationship = relationships.get(name)
+        if relationship is None or is_connection_type(unwrap_type(gql_field.type)):
+            # Connections are paginated by the database on their own
+            continue
+        attr = getattr(model, relationship.key)
+        if relationship.uselist:
+            loader = selectinload if parent_option is None else parent_option.selectinload
+        else:
+            loader = joinedload if parent_option is None else parent_option.joinedload
+        option = loader(attr)
+
+        child_type, child_asts = get_node_selection(info, gql_field.type, asts)
+        child_options = list(_eager_load_options(info, child_type, child_asts, option))
+        if child_options:
+            for child_option in child_options:
+                yield child_option
+        else:
+            yield option
+        if has_projection(child_type):
+            yield option.load_only(*get_selected_columns(info, child_type, child_asts))
+
+
+def get_eager_load_options(info):
+    """Returns the loader options eagerly loading every relationship selected
+    under the field being resolved: ``selectinload`` for collections and
+    ``joinedload`` for scalar relationships. The columns of the related
+    objects are restricted to the selected ones for types with
+    ``projection`` enabled. Connections of relationships are left out: they
+    fetch their page, and eager load under it, when resolved."""
+    gql_type, field_asts = get_node_selection(info, info.return_type, info.field_asts)
+    return list(_eager_load_options(info, gql_type, field_asts, None))
+
+
+def eager_load(query, info):
+    """Adds to ``query`` the options loading the relationships selected by the
+    client in a bounded number of queries.
+
+    It can be used from any resolver returning instances of a
+    SQLAlchemyObjectType, directly, in a list or in a connection.
+    """
+    options = get_eager_load_options(info)
+    if options:
+        query = query.options(*options)
+    return query
+
+
+def _implements(gql_type, selected_type):
+    return selected_type is gql_type or any(
+        interface is selected_type for interface in getattr(gql_type, "interfaces", ())
+    )
+
+
+def get_projected_columns(info, graphene_type=None):
+    """Returns the keys of the columns ``load_selected_columns`` restricts
+    the query to, or None if the selection doesn't apply to the type."""
+    selected_type, field_asts = get_node_selection(
+        info, info.return_type, info.field_asts
+    )
+    if graphene_type is None:
+        gql_type = selected_type
+    else:
+        gql_type = info.schema.get_type(graphene_type._meta.name)
+        if not _implements(gql_type, selected_type):
+            return None
+    if _get_model(gql_type) is None:
+        return None
+    return get_selected_columns(info, gql_type, field_asts)
+
+
+def load_selected_columns(query, info, graphene_type=None):
+    """Restricts the columns loaded by ``query`` to the ones needed by the
+    fields selected by the client, with ``load_only()``.
+
+    ``graphene_type`` is the SQLAlchemyObjectType the query returns; it
+    defaults to the type returned by the field being resolved. The query is
+    returned unchanged if the selection doesn't apply to that type.
+    """
+    columns = get_projected_columns(info, graphene_type)
+    if columns is None:
+        return query
+    return query.options(load_only(*columns))
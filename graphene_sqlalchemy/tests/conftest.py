@@ -0,0 +1,32 @@
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from ..registry import reset_global_registry
+from .models import Base
+
+# Tests using asyncio syntax
+collect_ignore = ["test_execution.py"] if sys.version_info < (3, 5) else []
+
+db = create_engine("sqlite:///test_sqlalchemy.sqlite3")
+
+
+@pytest.yield_fixture(scope="function")
+def session():
+    reset_global_registry()
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    Base.metadata.create_all(connection)
+
+    # options = dict(bind=connection, binds={})
+    session_factory = sessionmaker(bind=connection)
+    session = scoped_session(session_factory)
+
+    yield session
+
+    # Finalize test here
+    transaction.rollback()
+    connection.close()
+    session.remove()
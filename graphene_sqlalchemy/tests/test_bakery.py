@@ -0,0 +1,159 @@
+import graphene
+import pytest
+from graphene.relay import Connection, Node
+from sqlalchemy import orm
+
+from ..bakery import BAKED_QUERIES, bakery
+from ..fields import NodeField, SQLAlchemyConnectionField
+from ..types import SQLAlchemyObjectType
+from .models import Article, Reporter
+from .utils import count_queries
+
+
+def setup_fixtures(session):
+    for i in range(3):
+        reporter = Reporter(first_name="Reporter_{}".format(i))
+        session.add(reporter)
+        session.add(Article(headline="Article_{}".format(i), reporter=reporter))
+    session.commit()
+    session.expunge_all()
+
+
+class BakedConnectionField(SQLAlchemyConnectionField):
+    baked_queries = True
+
+
+def get_schema():
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+        iterable_is_query = graphene.Boolean()
+
+        def resolve_iterable_is_query(self, info):
+            return isinstance(self.iterable, orm.Query)
+
+    class Query(graphene.ObjectType):
+        node = NodeField()
+        reporters = BakedConnectionField(ReporterConnection)
+
+    return graphene.Schema(query=Query)
+
+
+query = """
+    query ($after: String, $sort: [ReporterSortEnum]) {
+      reporters(first: 1, after: $after, sort: $sort) {
+        pageInfo {
+          endCursor
+        }
+        edges {
+          node {
+            firstName
+            articles {
+              edges {
+                node {
+                  headline
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+"""
+
+
+def execute(schema, session, **variables):
+    result = schema.execute(
+        query, variables=variables, context_value={"session": session}
+    )
+    assert not result.errors
+    return result.data["reporters"]
+
+
+only_baked = pytest.mark.skipif(
+    not BAKED_QUERIES, reason="Queries are only baked with SQLAlchemy 1.3"
+)
+
+
+@only_baked
+def test_connection_query_compiled_once(session):
+    setup_fixtures(session)
+    schema = get_schema()
+
+    first = execute(schema, session)
+    assert first["edges"][0]["node"]["firstName"] == "Reporter_0"
+    second = execute(schema, session, after=first["pageInfo"]["endCursor"])
+    assert second["edges"][0]["node"]["firstName"] == "Reporter_1"
+
+    # Same shape: nothing new is compiled
+    size = len(bakery.cache)
+    with count_queries(session) as statements:
+        third = execute(schema, session, after=second["pageInfo"]["endCursor"])
+    assert len(bakery.cache) == size
+    assert len(statements) == 2
+    assert third["edges"] == [
+        {
+            "node": {
+                "firstName": "Reporter_2",
+                "articles": {"edges": [{"node": {"headline": "Article_2"}}]},
+            }
+        }
+    ]
+
+    # Another sort is another shape
+    reporters = execute(schema, session, sort=["first_name_desc"])
+    assert reporters["edges"][0]["node"]["firstName"] == "Reporter_2"
+    assert len(bakery.cache) > size
+
+
+def test_baked_connection_iterable(session):
+    setup_fixtures(session)
+    result = get_schema().execute(
+        "query { reporters(first: 1) { iterableIsQuery } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    # Like the pages fetched without baked queries
+    assert result.data["reporters"] == {"iterableIsQuery": True}
+
+
+@only_baked
+def test_node_baked(session):
+    setup_fixtures(session)
+    schema = get_schema()
+    query = """
+        query ($id: ID!) {
+          node(id: $id) {
+            ... on ReporterNode {
+              firstName
+            }
+          }
+        }
+    """
+
+    def get_node(id):
+        session.expunge_all()
+        result = schema.execute(
+            query,
+            variables={"id": Node.to_global_id("ReporterNode", id)},
+            context_value={"session": session},
+        )
+        assert not result.errors
+        return result.data["node"]
+
+    assert get_node(1) == {"firstName": "Reporter_0"}
+    size = len(bakery.cache)
+    assert get_node(2) == {"firstName": "Reporter_1"}
+    assert get_node(4) is None
+    assert len(bakery.cache) == size
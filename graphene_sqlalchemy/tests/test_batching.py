@@ -0,0 +1,741 @@
+import graphene
+import pytest
+from graphene.relay import Connection, Node
+from sqlalchemy.orm import configure_mappers
+
+from ..batching import (
+    _IDENTITIES_KEY,
+    MAX_BATCH_SIZE,
+    get_batch_resolver,
+    get_identities,
+)
+from .. import fields
+from ..fields import (
+    BatchSQLAlchemyConnectionField,
+    NodeField,
+    NodesField,
+    SQLAlchemyConnectionField,
+    registerConnectionFieldFactory,
+    unregisterConnectionFieldFactory,
+)
+from ..types import SQLAlchemyObjectType
+from .models import Article, Hairkind, Pet, Reporter
+from .utils import count_queries
+
+
+def setup_fixtures(session):
+    for i in range(3):
+        reporter = Reporter(first_name="Reporter_{}".format(i))
+        session.add(reporter)
+        for j in range(2):
+            session.add(Article(headline="Article_{}_{}".format(i, j), reporter=reporter))
+            pet = Pet(name="Pet_{}_{}".format(i, j), pet_kind="dog", hair_kind=Hairkind.LONG)
+            pet.reporters.append(reporter)
+            session.add(pet)
+    session.commit()
+    session.expunge_all()
+
+
+def test_get_batch_resolver():
+    configure_mappers()
+    assert get_batch_resolver(Article.reporter.property) is not None
+    assert get_batch_resolver(Reporter.articles.property) is not None
+
+
+def get_schema(session, use_batching=True):
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            batching = use_batching
+
+    class Query(graphene.ObjectType):
+        articles = graphene.List(ArticleType)
+
+        def resolve_articles(self, info):
+            return session.query(Article).order_by(Article.id).all()
+
+    return graphene.Schema(query=Query)
+
+
+query = """
+    query {
+      articles {
+        headline
+        reporter {
+          firstName
+        }
+      }
+    }
+"""
+
+
+def test_many_to_one_batching(session):
+    setup_fixtures(session)
+    schema = get_schema(session)
+
+    with count_queries(session) as statements:
+        result = schema.execute(query)
+    assert not result.errors
+    assert len(statements) == 2
+    assert result.data["articles"] == [
+        {
+            "headline": "Article_{}_{}".format(i, j),
+            "reporter": {"firstName": "Reporter_{}".format(i)},
+        }
+        for i in range(3)
+        for j in range(2)
+    ]
+
+
+def test_many_to_one_without_batching(session):
+    setup_fixtures(session)
+    schema = get_schema(session, use_batching=False)
+
+    with count_queries(session) as statements:
+        result = schema.execute(query)
+    assert not result.errors
+    assert len(statements) == 4
+
+
+def test_many_to_one_batching_uses_identity_map(session):
+    setup_fixtures(session)
+    schema = get_schema(session)
+
+    reporters = session.query(Reporter).all()  # noqa: F841
+    with count_queries(session) as statements:
+        result = schema.execute(query)
+    assert not result.errors
+    assert len(statements) == 1
+
+
+def test_many_to_one_batching_custom_resolver(session):
+    setup_fixtures(session)
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            batching = True
+
+        def resolve_reporter(self, info):
+            return Reporter(first_name="Custom")
+
+    class Query(graphene.ObjectType):
+        articles = graphene.List(ArticleType)
+
+        def resolve_articles(self, info):
+            return session.query(Article).all()
+
+    result = graphene.Schema(query=Query).execute(query)
+    assert not result.errors
+    assert {a["reporter"]["firstName"] for a in result.data["articles"]} == {"Custom"}
+
+
+def get_list_schema(session, use_batching=True):
+    class PetType(SQLAlchemyObjectType):
+        class Meta:
+            model = Pet
+
+    class ArticleType(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            batching = use_batching
+
+    class Query(graphene.ObjectType):
+        reporters = graphene.List(ReporterType)
+
+        def resolve_reporters(self, info):
+            return session.query(Reporter).order_by(Reporter.id).all()
+
+    return graphene.Schema(query=Query)
+
+
+list_query = """
+    query {
+      reporters {
+        firstName
+        pets {
+          name
+        }
+        articles {
+          headline
+        }
+      }
+    }
+"""
+
+
+def test_list_batching(session):
+    setup_fixtures(session)
+    schema = get_list_schema(session)
+
+    with count_queries(session) as statements:
+        result = schema.execute(list_query)
+    assert not result.errors
+    assert len(statements) == 3
+    # The relationships have no order_by
+    assert [
+        (
+            reporter["firstName"],
+            sorted(pet["name"] for pet in reporter["pets"]),
+            sorted(article["headline"] for article in reporter["articles"]),
+        )
+        for reporter in result.data["reporters"]
+    ] == [
+        (
+            "Reporter_{}".format(i),
+            ["Pet_{}_{}".format(i, j) for j in range(2)],
+            ["Article_{}_{}".format(i, j) for j in range(2)],
+        )
+        for i in range(3)
+    ]
+
+
+def test_list_without_batching(session):
+    setup_fixtures(session)
+    schema = get_list_schema(session, use_batching=False)
+
+    with count_queries(session) as statements:
+        result = schema.execute(list_query)
+    assert not result.errors
+    assert len(statements) == 7
+
+
+def test_list_batching_sets_committed_value(session):
+    setup_fixtures(session)
+    schema = get_list_schema(session)
+    reporters = session.query(Reporter).all()
+
+    result = schema.execute(list_query)
+    assert not result.errors
+    with count_queries(session) as statements:
+        assert [len(reporter.pets) for reporter in reporters] == [2, 2, 2]
+        assert [len(reporter.articles) for reporter in reporters] == [2, 2, 2]
+    assert len(statements) == 0
+
+
+class CountableConnection(Connection):
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(self, info):
+        return self.length
+
+
+def get_connection_schema(session):
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+            connection_class = CountableConnection
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            batching = True
+
+    class Query(graphene.ObjectType):
+        reporters = graphene.List(ReporterType)
+
+        def resolve_reporters(self, info):
+            return session.query(Reporter).order_by(Reporter.id).all()
+
+    return graphene.Schema(query=Query)
+
+
+def test_connection_batching(session):
+    setup_fixtures(session)
+    schema = get_connection_schema(session)
+    query = """
+        query {
+          reporters {
+            firstName
+            articles(first: 1) {
+              pageInfo {
+                hasNextPage
+                endCursor
+              }
+              edges {
+                node {
+                  headline
+                }
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query)
+    assert not result.errors
+    assert len(statements) == 2
+    assert "row_number() OVER (PARTITION BY" in statements[1]
+    assert [reporter["articles"] for reporter in result.data["reporters"]] == [
+        {
+            "pageInfo": {"hasNextPage": True, "endCursor": "YXJyYXljb25uZWN0aW9uOjA="},
+            "edges": [{"node": {"headline": "Article_{}_0".format(i)}}],
+        }
+        for i in range(3)
+    ]
+
+    query = """
+        query {
+          reporters {
+            articles(first: 5, after: "YXJyYXljb25uZWN0aW9uOjA=") {
+              totalCount
+              pageInfo {
+                hasNextPage
+              }
+              edges {
+                node {
+                  headline
+                }
+              }
+            }
+          }
+        }
+    """
+    with count_queries(session) as statements:
+        result = schema.execute(query)
+    assert not result.errors
+    # reporters, the page of articles and their count
+    assert len(statements) == 3
+    assert [reporter["articles"] for reporter in result.data["reporters"]] == [
+        {
+            "totalCount": 2,
+            "pageInfo": {"hasNextPage": False},
+            "edges": [{"node": {"headline": "Article_{}_1".format(i)}}],
+        }
+        for i in range(3)
+    ]
+
+
+def test_connection_batching_last(session):
+    setup_fixtures(session)
+    schema = get_connection_schema(session)
+    query = """
+        query {
+          reporters {
+            articles(last: 1) {
+              edges {
+                node {
+                  headline
+                }
+              }
+            }
+          }
+        }
+    """
+
+    result = schema.execute(query)
+    assert not result.errors
+    assert [reporter["articles"]["edges"] for reporter in result.data["reporters"]] == [
+        [{"node": {"headline": "Article_{}_1".format(i)}}] for i in range(3)
+    ]
+
+
+def test_connection_batching_without_window_functions(session, monkeypatch):
+    setup_fixtures(session)
+    schema = get_connection_schema(session)
+    monkeypatch.setattr(fields, "supports_window_functions", lambda dialect: False)
+    query = """
+        query {
+          reporters {
+            articles(first: 1) {
+              edges {
+                node {
+                  headline
+                }
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query)
+    assert not result.errors
+    # One query per reporter
+    assert len(statements) == 4
+    assert not any("OVER" in statement for statement in statements)
+    assert [reporter["articles"]["edges"] for reporter in result.data["reporters"]] == [
+        [{"node": {"headline": "Article_{}_0".format(i)}}] for i in range(3)
+    ]
+
+
+def test_connection_batching_factory(session):
+    setup_fixtures(session)
+
+    class BatchConnectionField(BatchSQLAlchemyConnectionField):
+        pass
+
+    registerConnectionFieldFactory(BatchConnectionField)
+    try:
+        schema = get_connection_schema(session)
+        reporter_type = schema.get_type("ReporterType").graphene_type
+        field = reporter_type._meta.fields["articles"].get_type()
+        assert isinstance(field, BatchConnectionField)
+        assert field.relationship is Reporter.articles.property
+    finally:
+        unregisterConnectionFieldFactory()
+
+    registerConnectionFieldFactory(SQLAlchemyConnectionField)
+    try:
+        with pytest.raises(Exception) as excinfo:
+            get_connection_schema(session)
+        assert "BatchSQLAlchemyConnectionField" in str(excinfo.value)
+    finally:
+        unregisterConnectionFieldFactory()
+
+
+def get_node_schema():
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class Query(graphene.ObjectType):
+        node = NodeField()
+        nodes = NodesField()
+
+    return graphene.Schema(query=Query, types=[ReporterNode, ArticleNode])
+
+
+def test_node_batching(session):
+    setup_fixtures(session)
+    schema = get_node_schema()
+    ids = [Node.to_global_id("ArticleNode", i) for i in range(1, 4)]
+    query = """
+        query {{
+          {}
+        }}
+    """.format(
+        "\n".join(
+            'a{}: node(id: "{}") {{ ... on ArticleNode {{ headline }} }}'.format(i, id)
+            for i, id in enumerate(ids)
+        )
+    )
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 1
+    assert result.data == {
+        "a0": {"headline": "Article_0_0"},
+        "a1": {"headline": "Article_0_1"},
+        "a2": {"headline": "Article_1_0"},
+    }
+
+
+def test_nodes_field(session):
+    setup_fixtures(session)
+    schema = get_node_schema()
+    query = """
+        query ($ids: [ID!]!) {
+          nodes(ids: $ids) {
+            __typename
+            ... on ArticleNode {
+              headline
+            }
+            ... on ReporterNode {
+              firstName
+            }
+          }
+        }
+    """
+    ids = [
+        Node.to_global_id("ArticleNode", 2),
+        Node.to_global_id("ReporterNode", 3),
+        Node.to_global_id("ArticleNode", 1),
+        Node.to_global_id("ReporterNode", 1),
+        Node.to_global_id("ArticleNode", 100),
+        Node.to_global_id("ArticleNode", "not an id"),
+        "invalid",
+    ]
+
+    with count_queries(session) as statements:
+        result = schema.execute(
+            query, variables={"ids": ids}, context_value={"session": session}
+        )
+    assert not result.errors
+    # One query per model
+    assert len(statements) == 2
+    assert result.data["nodes"] == [
+        {"__typename": "ArticleNode", "headline": "Article_0_1"},
+        {"__typename": "ReporterNode", "firstName": "Reporter_2"},
+        {"__typename": "ArticleNode", "headline": "Article_0_0"},
+        {"__typename": "ReporterNode", "firstName": "Reporter_0"},
+        None,
+        None,
+        None,
+    ]
+
+
+def test_overridden_get_node(session):
+    setup_fixtures(session)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+        @classmethod
+        def get_node(cls, info, id):
+            reporter = super(ReporterNode, cls).get_node(info, id)
+            if reporter is not None and reporter.first_name == "Reporter_1":
+                # Denied
+                return None
+            return reporter
+
+    class Query(graphene.ObjectType):
+        node = NodeField()
+        nodes = NodesField()
+
+    schema = graphene.Schema(query=Query, types=[ReporterNode])
+    query = """
+        query ($id: ID!, $ids: [ID!]!) {
+          node(id: $id) {
+            ... on ReporterNode {
+              firstName
+            }
+          }
+          nodes(ids: $ids) {
+            ... on ReporterNode {
+              firstName
+            }
+          }
+        }
+    """
+    result = schema.execute(
+        query,
+        variables={
+            "id": Node.to_global_id("ReporterNode", 2),
+            "ids": [Node.to_global_id("ReporterNode", i) for i in (1, 2)],
+        },
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data == {"node": None, "nodes": [{"firstName": "Reporter_0"}, None]}
+
+
+def test_get_node_returns_instance(session):
+    setup_fixtures(session)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class RenameReporter(graphene.Mutation):
+        class Arguments:
+            id = graphene.ID(required=True)
+            first_name = graphene.String(required=True)
+
+        reporter = graphene.Field(ReporterNode)
+
+        def mutate(self, info, id, first_name):
+            reporter = ReporterNode.get_node(info, id)
+            reporter.first_name = first_name
+            session.commit()
+            return RenameReporter(reporter=reporter)
+
+    class Query(graphene.ObjectType):
+        node = NodeField()
+
+    class Mutation(graphene.ObjectType):
+        rename_reporter = RenameReporter.Field()
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    result = schema.execute(
+        'mutation { renameReporter(id: 2, firstName: "B") { reporter { firstName } } }',
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data["renameReporter"]["reporter"] == {"firstName": "B"}
+    session.expunge_all()
+    assert session.query(Reporter).get(2).first_name == "B"
+
+
+class KeepingConnectionField(SQLAlchemyConnectionField):
+    keep_instances = True
+
+
+def test_node_from_connection_page(session):
+    setup_fixtures(session)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+    class Query(graphene.ObjectType):
+        node = NodeField()
+        reporters = KeepingConnectionField(ReporterConnection)
+
+    schema = graphene.Schema(query=Query)
+    query = """
+        query {
+          reporters(first: 2) {
+            edges {
+              node {
+                firstName
+              }
+            }
+          }
+          node(id: "%s") {
+            ... on ReporterNode {
+              firstName
+            }
+          }
+        }
+    """ % Node.to_global_id("ReporterNode", 1)
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    # The reporter is found among the ones loaded by the connection
+    assert len(statements) == 1
+    assert result.data["node"] == {"firstName": "Reporter_0"}
+
+    # Expired instances are fetched again
+    session.expire_all()
+    query = """
+        query {
+          node(id: "%s") {
+            ... on ReporterNode {
+              firstName
+            }
+          }
+        }
+    """ % Node.to_global_id("ReporterNode", 1)
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 1
+    assert result.data["node"] == {"firstName": "Reporter_0"}
+
+
+def test_kept_instances_lifetime(session):
+    setup_fixtures(session)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+    def execute(field_class):
+        class Query(graphene.ObjectType):
+            reporters = field_class(ReporterConnection)
+
+        result = graphene.Schema(query=Query).execute(
+            "query { reporters { edges { node { firstName } } } }",
+            context_value={"session": session},
+        )
+        assert not result.errors
+        return len(get_identities(session()))
+
+    # Not kept by default
+    assert execute(SQLAlchemyConnectionField) == 0
+    assert execute(KeepingConnectionField) == 3
+    # Until the end of the transaction
+    session.commit()
+    assert _IDENTITIES_KEY not in session.info
+    assert execute(KeepingConnectionField) == 3
+    session.close()
+    assert _IDENTITIES_KEY not in session.info
+
+
+def test_kept_instances_nested_pages(session):
+    setup_fixtures(session)
+
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            batching = True
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+    def execute(field_class):
+        class Query(graphene.ObjectType):
+            reporters = field_class(ReporterConnection)
+
+        result = graphene.Schema(query=Query).execute(
+            """
+            query {
+              reporters {
+                edges { node { articles { edges { node { headline } } } } }
+              }
+            }
+            """,
+            context_value={"session": session},
+        )
+        assert not result.errors
+        identities = get_identities(session())
+        session.commit()
+        return sorted(key[0].__name__ for key in identities)
+
+    # The articles of the kept reporters are kept too
+    assert execute(KeepingConnectionField) == ["Article"] * 6 + ["Reporter"] * 3
+    assert execute(SQLAlchemyConnectionField) == []
+
+
+def test_max_batch_size(session):
+    for i in range(MAX_BATCH_SIZE + 1):
+        session.add(Reporter(id=i + 1, first_name="Reporter_{}".format(i)))
+    session.commit()
+    session.expunge_all()
+    schema = get_node_schema()
+    query = """
+        query ($ids: [ID!]!) {
+          nodes(ids: $ids) {
+            ... on ReporterNode {
+              firstName
+            }
+          }
+        }
+    """
+    ids = [Node.to_global_id("ReporterNode", i + 1) for i in range(MAX_BATCH_SIZE + 1)]
+
+    with count_queries(session) as statements:
+        result = schema.execute(
+            query, variables={"ids": ids}, context_value={"session": session}
+        )
+    assert not result.errors
+    # The ids are fetched in two chunks
+    assert len(statements) == 2
+    assert len(result.data["nodes"]) == MAX_BATCH_SIZE + 1
+    assert result.data["nodes"][-1] == {"firstName": "Reporter_{}".format(MAX_BATCH_SIZE)}
@@ -0,0 +1,140 @@
+import graphene
+from graphene.relay import Connection, Node
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from ..cache import LRUCache
+from ..counting import CachedCount, EstimatedCount, exact_count
+from ..fields import SQLAlchemyConnectionField
+from ..types import SQLAlchemyObjectType
+from .models import Base, Hairkind, Pet
+from .utils import count_queries
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_cache_ttl():
+    timer = FakeTimer()
+    cache = LRUCache(ttl=10, timer=timer)
+    cache.set("a", 1)
+    timer.now = 9
+    assert cache.get("a") == 1
+    timer.now = 10
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def add_pets(session, count):
+    for i in range(count):
+        session.add(Pet(name="Pet_{}".format(i), pet_kind="dog", hair_kind=Hairkind.LONG))
+    session.commit()
+
+
+def test_cached_count(session):
+    add_pets(session, 3)
+    count = CachedCount(ttl=60)
+
+    query = session.query(Pet)
+    assert count(query) == 3
+    add_pets(session, 1)
+    with count_queries(session) as statements:
+        assert count(session.query(Pet)) == 3
+    assert statements == []
+    assert count(session.query(Pet).filter(Pet.name != "Nobody")) == 4
+
+
+def test_estimated_count(session):
+    add_pets(session, 3)
+    estimations = {}
+
+    count = EstimatedCount(lambda query: estimations.get("pets"), exact_below=1000)
+    assert count(session.query(Pet)) == 3
+    estimations["pets"] = 500
+    assert count(session.query(Pet)) == 3
+    estimations["pets"] = 2300000
+    assert count(session.query(Pet)) == 2300000
+
+
+def test_exact_count(session):
+    add_pets(session, 3)
+    assert exact_count(session.query(Pet)) == 3
+
+
+class CachedCountConnectionField(SQLAlchemyConnectionField):
+    count_strategy = CachedCount(ttl=60)
+
+
+def test_connection_count_strategy(session):
+    add_pets(session, 3)
+
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Pet
+            interfaces = (Node,)
+
+    class PetConnection(Connection):
+        class Meta:
+            node = PetNode
+
+        total_count = graphene.Int()
+
+        def resolve_total_count(self, info):
+            return self.length
+
+    class Query(graphene.ObjectType):
+        pets = CachedCountConnectionField(PetConnection)
+
+    schema = graphene.Schema(query=Query)
+    query = """
+        query {
+          pets(first: 10) {
+            totalCount
+            edges {
+              node {
+                name
+              }
+            }
+          }
+        }
+    """
+    result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert result.data["pets"]["totalCount"] == 3
+
+    add_pets(session, 1)
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 1
+    # The count is cached, but the page is always exact
+    assert result.data["pets"]["totalCount"] == 3
+    assert len(result.data["pets"]["edges"]) == 4
+
+
+def test_cached_count_per_database(tmpdir):
+    count = CachedCount(ttl=60)
+    for i, tenant in enumerate(("acme", "globex")):
+        engine = create_engine("sqlite:///{}".format(tmpdir.join(tenant + ".sqlite3")))
+        Base.metadata.create_all(engine)
+        session = Session(bind=engine)
+        add_pets(session, i + 1)
+        assert count(session.query(Pet)) == i + 1
+        session.close()
@@ -0,0 +1,249 @@
+import asyncio
+import threading
+import time
+
+import graphene
+import pytest
+from graphene.relay import Connection, Node
+from graphql.execution.executors.asyncio import AsyncioExecutor
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from ..batching import get_session_query_pool
+from ..execution import QueryPool, execute_concurrently
+from ..fields import NodeField, SQLAlchemyConnectionField
+from ..registry import reset_global_registry
+from ..types import SQLAlchemyObjectType
+from .models import Article, Base, Reporter
+
+
+@pytest.fixture
+def session_factory(tmpdir):
+    reset_global_registry()
+    engine = create_engine(
+        "sqlite:///{}".format(tmpdir.join("execution.sqlite3")),
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    session = session_factory()
+    for i in range(3):
+        reporter = Reporter(first_name="Reporter_{}".format(i))
+        session.add(reporter)
+        session.add(Article(headline="Article_{}".format(i), reporter=reporter))
+    session.commit()
+    session.close()
+
+    threads = []
+
+    def before_cursor_execute(*args):
+        threads.append(threading.current_thread())
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    session_factory.threads = threads
+    yield session_factory
+    engine.dispose()
+
+
+def get_schema():
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+            batching = True
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            batching = True
+
+    class ArticleConnection(Connection):
+        class Meta:
+            node = ArticleNode
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+    class Query(graphene.ObjectType):
+        node = NodeField()
+        reporters = SQLAlchemyConnectionField(ReporterConnection)
+        articles = SQLAlchemyConnectionField(ArticleConnection)
+
+    return graphene.Schema(query=Query)
+
+
+query = """
+    query ($id: ID!) {
+      reporters(first: 2) {
+        edges {
+          node {
+            firstName
+            articles(first: 1) {
+              edges {
+                node {
+                  headline
+                }
+              }
+            }
+          }
+        }
+      }
+      articles {
+        edges {
+          node {
+            headline
+            reporter {
+              firstName
+            }
+          }
+        }
+      }
+      node(id: $id) {
+        ... on ReporterNode {
+          firstName
+        }
+      }
+    }
+"""
+
+
+def test_query_pool(session_factory):
+    schema = get_schema()
+    loop = asyncio.new_event_loop()
+    pool = QueryPool(session_factory, loop=loop)
+    main_session = session_factory()
+
+    async def execute():
+        return await schema.execute(
+            query,
+            variables={"id": Node.to_global_id("ReporterNode", 3)},
+            context_value={"session": main_session, "query_pool": pool},
+            executor=AsyncioExecutor(loop),
+            return_promise=True,
+        )
+
+    try:
+        result = loop.run_until_complete(execute())
+        sessions = list(pool.sessions)
+    finally:
+        pool.close()
+        main_session.close()
+        loop.close()
+
+    assert not result.errors
+    assert result.data == {
+        "reporters": {
+            "edges": [
+                {
+                    "node": {
+                        "firstName": "Reporter_{}".format(i),
+                        "articles": {
+                            "edges": [{"node": {"headline": "Article_{}".format(i)}}]
+                        },
+                    }
+                }
+                for i in range(2)
+            ]
+        },
+        "articles": {
+            "edges": [
+                {
+                    "node": {
+                        "headline": "Article_{}".format(i),
+                        "reporter": {"firstName": "Reporter_{}".format(i)},
+                    }
+                }
+                for i in range(3)
+            ]
+        },
+        "node": {"firstName": "Reporter_2"},
+    }
+    # Every query ran in the thread pool, with a session of its own
+    assert session_factory.threads
+    assert threading.main_thread() not in session_factory.threads
+    # One per root connection, batch of nested pages and batch of nodes (the
+    # reporters of the articles are eagerly loaded)
+    assert len(sessions) == 4
+    assert pool.sessions == []
+
+
+def test_execute_concurrently(session_factory):
+    schema = get_schema()
+    engine = session_factory.kw["bind"]
+    running = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def before_cursor_execute(*args):
+        with lock:
+            running.append(None)
+            peak[0] = max(peak[0], len(running))
+        # Slow enough for the queries of sibling fields to overlap
+        time.sleep(0.05)
+
+    def after_cursor_execute(*args):
+        with lock:
+            running.pop()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    query = """
+        query {
+          a: reporters(first: 1) { edges { node { firstName } } }
+          b: reporters(first: 2) { edges { node { firstName } } }
+          c: articles(first: 1) { edges { node { headline } } }
+          d: articles(first: 2) { edges { node { headline } } }
+        }
+    """
+
+    def execute(limit):
+        del session_factory.threads[:]
+        peak[0] = 0
+        pool = QueryPool(session_factory, limit=limit)
+        result = execute_concurrently(schema, query, pool)
+        assert not result.errors
+        assert len(result.data["b"]["edges"]) == 2
+        assert len(result.data["d"]["edges"]) == 2
+        assert pool.sessions == []
+        return peak[0]
+
+    assert execute(limit=None) > 1
+    assert execute(limit=1) == 1
+    assert threading.main_thread() not in session_factory.threads
+
+
+def test_query_pool_unbound_on_close(session_factory):
+    schema = get_schema()
+    session = session_factory()
+    node_query = """
+        query ($id: ID!) {
+          node(id: $id) {
+            ... on ReporterNode {
+              firstName
+            }
+          }
+        }
+    """
+    variables = {"id": Node.to_global_id("ReporterNode", 1)}
+
+    try:
+        pool = QueryPool(session_factory)
+        result = execute_concurrently(
+            schema, node_query, pool, variables=variables, context_value={"session": session}
+        )
+        assert not result.errors
+        assert result.data == {"node": {"firstName": "Reporter_0"}}
+        assert get_session_query_pool(session) is None
+        assert pool.bound_sessions == []
+
+        # Run without the pool, whose event loop is closed
+        result = schema.execute(
+            node_query, variables=variables, context_value={"session": session}
+        )
+        assert not result.errors
+        assert result.data == {"node": {"firstName": "Reporter_0"}}
+    finally:
+        session.close()
@@ -0,0 +1,266 @@
+from datetime import date
+
+import graphene
+from graphene.relay import Connection, Node
+
+from ..fields import SQLAlchemyConnectionField
+from ..keyset import cursor_to_keyset, get_keyset, keyset_to_cursor
+from ..types import SQLAlchemyObjectType
+from .models import Article, Hairkind, Pet, Reporter
+from .utils import count_queries
+
+
+class KeysetConnectionField(SQLAlchemyConnectionField):
+    keyset_pagination = True
+
+
+def setup_fixtures(session):
+    names = ["Alf", "Barf", "Cat", "Dog", "Eel", "Fox"]
+    for i, name in enumerate(names):
+        session.add(
+            Pet(
+                id=i + 1,
+                name=name,
+                pet_kind="cat" if i % 2 else "dog",
+                hair_kind=Hairkind.LONG if i < 3 else Hairkind.SHORT,
+            )
+        )
+        session.add(Article(id=i + 1, headline=name, pub_date=date(2018, 1, 6 - i)))
+    session.commit()
+
+
+def get_schema():
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Pet
+            interfaces = (Node,)
+
+    class PetConnection(Connection):
+        class Meta:
+            node = PetNode
+
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ArticleConnection(Connection):
+        class Meta:
+            node = ArticleNode
+
+    class Query(graphene.ObjectType):
+        pets = KeysetConnectionField(PetConnection)
+        articles = KeysetConnectionField(ArticleConnection)
+
+    return graphene.Schema(query=Query)
+
+
+pets_query = """
+    query ($sort: [PetSortEnum], $first: Int, $last: Int, $after: String, $before: String) {
+      pets(sort: $sort, first: $first, last: $last, after: $after, before: $before) {
+        pageInfo {
+          hasNextPage
+          hasPreviousPage
+          startCursor
+          endCursor
+        }
+        edges {
+          node {
+            name
+          }
+        }
+      }
+    }
+"""
+
+
+def execute(session, schema, **variables):
+    result = schema.execute(
+        pets_query, variables=variables, context_value={"session": session}
+    )
+    assert not result.errors
+    pets = result.data["pets"]
+    return [edge["node"]["name"] for edge in pets["edges"]], pets["pageInfo"]
+
+
+def test_keyset_cursor_roundtrip():
+    keyset = get_keyset(Article, [Article.pub_date.desc(), Article.headline.asc()])
+    assert [descending for _, descending in keyset] == [True, False, False]
+    values = [date(2018, 1, 1), "Hi", 3]
+    cursor = keyset_to_cursor(keyset, values)
+    assert cursor_to_keyset(keyset, cursor) == values
+
+
+def test_keyset_forward_pagination(session):
+    setup_fixtures(session)
+    schema = get_schema()
+
+    names, page_info = execute(session, schema, sort=["name_desc"], first=4)
+    assert names == ["Fox", "Eel", "Dog", "Cat"]
+    assert page_info["hasNextPage"]
+
+    with count_queries(session) as statements:
+        names, page_info = execute(
+            session, schema, sort=["name_desc"], first=4, after=page_info["endCursor"]
+        )
+    assert names == ["Barf", "Alf"]
+    assert not page_info["hasNextPage"]
+    page_query = [statement for statement in statements if "LIMIT" in statement]
+    assert len(page_query) == 1
+    assert "pets.name < ?" in page_query[0]
+
+
+def test_keyset_backward_pagination(session):
+    setup_fixtures(session)
+    schema = get_schema()
+
+    names, page_info = execute(session, schema, last=2)
+    assert names == ["Eel", "Fox"]
+    assert page_info["hasPreviousPage"]
+    assert not page_info["hasNextPage"]
+
+    names, page_info = execute(session, schema, last=3, before=page_info["startCursor"])
+    assert names == ["Barf", "Cat", "Dog"]
+    assert page_info["hasPreviousPage"]
+
+    names, page_info = execute(session, schema, last=3, before=page_info["startCursor"])
+    assert names == ["Alf"]
+    assert not page_info["hasPreviousPage"]
+
+
+def test_keyset_mixed_directions(session):
+    setup_fixtures(session)
+    schema = get_schema()
+
+    sort = ["pet_kind_asc", "name_desc"]
+    names, page_info = execute(session, schema, sort=sort, first=2)
+    assert names == ["Fox", "Dog"]
+    names, page_info = execute(
+        session, schema, sort=sort, first=2, after=page_info["endCursor"]
+    )
+    assert names == ["Barf", "Eel"]
+    names, page_info = execute(
+        session, schema, sort=sort, first=2, after=page_info["endCursor"]
+    )
+    assert names == ["Cat", "Alf"]
+    assert not page_info["hasNextPage"]
+
+
+def test_keyset_enum_and_date_columns(session):
+    setup_fixtures(session)
+    schema = get_schema()
+
+    names, page_info = execute(session, schema, sort=["hair_kind_desc", "name_asc"], first=4)
+    assert names == ["Dog", "Eel", "Fox", "Alf"]
+    names, _ = execute(
+        session,
+        schema,
+        sort=["hair_kind_desc", "name_asc"],
+        after=page_info["endCursor"],
+    )
+    assert names == ["Barf", "Cat"]
+
+    query = """
+        query ($after: String) {
+          articles(sort: pub_date_asc, first: 2, after: $after) {
+            pageInfo {
+              endCursor
+            }
+            edges {
+              node {
+                headline
+              }
+            }
+          }
+        }
+    """
+    result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    articles = result.data["articles"]
+    assert [edge["node"]["headline"] for edge in articles["edges"]] == ["Fox", "Eel"]
+    result = schema.execute(
+        query,
+        variables={"after": articles["pageInfo"]["endCursor"]},
+        context_value={"session": session},
+    )
+    assert not result.errors
+    articles = result.data["articles"]
+    assert [edge["node"]["headline"] for edge in articles["edges"]] == ["Dog", "Cat"]
+
+
+def test_keyset_invalid_cursor(session):
+    setup_fixtures(session)
+    schema = get_schema()
+
+    result = schema.execute(
+        pets_query, variables={"after": "YXJyYXljb25uZWN0aW9uOjA="}, context_value={"session": session}
+    )
+    assert result.errors
+    assert "Invalid cursor" in str(result.errors[0])
+
+
+def test_keyset_nullable_sort_column(session):
+    for i, email in enumerate(["b@x", None, "a@x", None]):
+        session.add(Reporter(id=i + 1, first_name="R{}".format(i + 1), email=email))
+    session.commit()
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+    class Query(graphene.ObjectType):
+        reporters = KeysetConnectionField(ReporterConnection)
+
+    schema = graphene.Schema(query=Query)
+    query = """
+        query ($sort: [ReporterSortEnum], $first: Int, $last: Int,
+               $after: String, $before: String) {
+          reporters(sort: $sort, first: $first, last: $last,
+                    after: $after, before: $before) {
+            pageInfo {
+              hasNextPage
+              hasPreviousPage
+              startCursor
+              endCursor
+            }
+            edges {
+              node {
+                firstName
+              }
+            }
+          }
+        }
+    """
+
+    def paginate(sort, forward):
+        names = []
+        cursor = None
+        while True:
+            if forward:
+                variables = {"sort": sort, "first": 1, "after": cursor}
+            else:
+                variables = {"sort": sort, "last": 1, "before": cursor}
+            result = schema.execute(
+                query, variables=variables, context_value={"session": session}
+            )
+            assert not result.errors
+            reporters = result.data["reporters"]
+            page = [edge["node"]["firstName"] for edge in reporters["edges"]]
+            names.extend(page if forward else page[::-1])
+            page_info = reporters["pageInfo"]
+            if forward and not page_info["hasNextPage"]:
+                return names
+            if not forward and not page_info["hasPreviousPage"]:
+                return names[::-1]
+            cursor = page_info["endCursor" if forward else "startCursor"]
+
+    # SQLite sorts NULL first in ascending order
+    assert paginate(["email_asc"], forward=True) == ["R2", "R4", "R3", "R1"]
+    assert paginate(["email_asc"], forward=False) == ["R2", "R4", "R3", "R1"]
+    assert paginate(["email_desc"], forward=True) == ["R1", "R3", "R2", "R4"]
+    assert paginate(["email_desc"], forward=False) == ["R1", "R3", "R2", "R4"]
@@ -0,0 +1,230 @@
+import graphene
+import pytest
+from graphene.relay import Connection, Node
+from sqlalchemy.orm import Query, Session, load_only
+from sqlalchemy.sql.compiler import SQLCompiler
+
+from ..bakery import BAKED_QUERIES
+from ..fields import SQLAlchemyConnectionField
+from ..memo import clear_memo, fetch_all
+from ..types import SQLAlchemyObjectType
+from .models import Hairkind, Pet
+from .utils import count_queries
+
+
+def add_pets(session, *names):
+    for name in names:
+        session.add(Pet(name=name, pet_kind="dog", hair_kind=Hairkind.LONG))
+    session.commit()
+
+
+class MemoConnectionField(SQLAlchemyConnectionField):
+    memoize_queries = True
+
+
+def get_schema(field_class=MemoConnectionField):
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Pet
+            interfaces = (Node,)
+
+    class PetConnection(Connection):
+        class Meta:
+            node = PetNode
+
+        total_count = graphene.Int()
+
+        def resolve_total_count(self, info):
+            return self.length
+
+    class Query(graphene.ObjectType):
+        pets = field_class(PetConnection)
+
+    return graphene.Schema(query=Query)
+
+
+def test_identical_connections_run_once(session):
+    add_pets(session, "Lassie", "Barf", "Alf")
+    schema = get_schema()
+    query = """
+        query {
+          a: pets(first: 2) {
+            totalCount
+            edges {
+              node {
+                name
+              }
+            }
+          }
+          b: pets(first: 2) {
+            totalCount
+            edges {
+              node {
+                id
+              }
+            }
+          }
+          c: pets(first: 1) {
+            edges {
+              node {
+                name
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    # The page and count shared by `a` and `b`, and the page of `c`
+    assert len(statements) == 3
+    assert result.data["a"]["totalCount"] == result.data["b"]["totalCount"] == 3
+    assert [edge["node"]["name"] for edge in result.data["a"]["edges"]] == [
+        "Lassie",
+        "Barf",
+    ]
+    assert len(result.data["b"]["edges"]) == 2
+    assert len(result.data["c"]["edges"]) == 1
+
+
+def test_not_memoized_by_default(session):
+    add_pets(session, "Lassie", "Barf", "Alf")
+    query = """
+        query {
+          a: pets(first: 2) {
+            edges {
+              node {
+                name
+              }
+            }
+          }
+          b: pets(first: 2) {
+            edges {
+              node {
+                name
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = get_schema(SQLAlchemyConnectionField).execute(
+            query, context_value={"session": session}
+        )
+    assert not result.errors
+    assert len(statements) == 2
+    assert result.data["a"] == result.data["b"]
+
+
+def test_memo_scoped_to_execution(session):
+    add_pets(session, "Lassie")
+    schema = get_schema()
+    query = "query { pets { edges { node { name } } } }"
+
+    def execute():
+        result = schema.execute(query, context_value={"session": session})
+        assert not result.errors
+        return [edge["node"]["name"] for edge in result.data["pets"]["edges"]]
+
+    assert execute() == ["Lassie"]
+    # Committed by another session during the transaction of the request session
+    other_session = Session(bind=session.bind)
+    other_session.add(Pet(name="Barf", pet_kind="dog", hair_kind=Hairkind.LONG))
+    other_session.commit()
+    assert execute() == ["Lassie", "Barf"]
+
+
+def test_memo_cleared_by_changes(session):
+    add_pets(session, "Lassie")
+    memo = {}
+    query = session.query(Pet).order_by(Pet.id)
+    assert [pet.name for pet in fetch_all(query, memo)] == ["Lassie"]
+
+    # Pending changes are flushed by the query rather than served from the memo
+    session.add(Pet(name="Barf", pet_kind="dog", hair_kind=Hairkind.LONG))
+    assert [pet.name for pet in fetch_all(query, memo)] == ["Lassie", "Barf"]
+
+    fetch_all(query, memo)
+    with count_queries(session) as statements:
+        fetch_all(query, memo)
+    assert statements == []
+
+    clear_memo(session)
+    with count_queries(session) as statements:
+        fetch_all(query, memo)
+    assert len(statements) == 1
+
+
+def test_memo_cleared_at_transaction_end(session):
+    add_pets(session, "Lassie")
+    memo = {}
+    query = session.query(Pet).order_by(Pet.id)
+    assert [pet.name for pet in fetch_all(query, memo)] == ["Lassie"]
+    session.close()
+
+    # Changed by another session
+    other_session = Session(bind=session.bind)
+    other_session.add(Pet(name="Barf", pet_kind="dog", hair_kind=Hairkind.LONG))
+    other_session.commit()
+
+    query = session.query(Pet).order_by(Pet.id)
+    assert [pet.name for pet in fetch_all(query, memo)] == ["Lassie", "Barf"]
+
+
+def test_memo_key(session):
+    add_pets(session, "Lassie")
+    memo = {}
+    instances = fetch_all(session.query(Pet).options(load_only("name")), memo)
+    assert [pet.name for pet in instances] == ["Lassie"]
+    # Same statement, other entities
+    rows = fetch_all(session.query(Pet).with_entities(Pet.id, Pet.name), memo)
+    assert [tuple(row) for row in rows] == [(instances[0].id, "Lassie")]
+
+    # Same statement, other loader options
+    with count_queries(session) as statements:
+        fetch_all(session.query(Pet).options(load_only("name")), memo)
+    assert len(statements) == 1
+
+
+def test_memo_uses_query_class(session):
+    add_pets(session, "Lassie", "Secret")
+
+    class PublicQuery(Query):
+        def __iter__(self):
+            return super(PublicQuery, self.filter(Pet.name != "Secret")).__iter__()
+
+    public_session = Session(bind=session.bind, query_cls=PublicQuery)
+    memo = {}
+    for _ in range(2):
+        pets = fetch_all(public_session.query(Pet), memo)
+        assert [pet.name for pet in pets] == ["Lassie"]
+
+
+@pytest.mark.skipif(
+    not BAKED_QUERIES, reason="SQLAlchemy 1.4 caches the compiled statements"
+)
+def test_statements_compiled_once(session, monkeypatch):
+    add_pets(session, "Lassie", "Barf", "Alf")
+    compiled = []
+    init = SQLCompiler.__init__
+
+    def compiler_init(self, *args, **kwargs):
+        compiled.append(self)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(SQLCompiler, "__init__", compiler_init)
+
+    schema = get_schema(SQLAlchemyConnectionField)
+    for query in (
+        "query { pets(first: 2) { edges { node { name } } } }",
+        "query { pets(first: 2) { totalCount edges { node { name } } } }",
+        "query { pets(last: 2) { totalCount edges { node { name } } } }",
+    ):
+        session.expunge_all()
+        del compiled[:]
+        with count_queries(session) as statements:
+            result = schema.execute(query, context_value={"session": session})
+        assert not result.errors
+        assert len(compiled) == len(statements)
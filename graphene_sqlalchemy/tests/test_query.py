@@ -1,36 +1,13 @@
-import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
-
 import graphene
 from graphene.relay import Connection, Node
+from graphql_relay.connection.arrayconnection import offset_to_cursor
+from sqlalchemy import inspect
 
-from ..registry import reset_global_registry
 from ..fields import SQLAlchemyConnectionField
 from ..types import SQLAlchemyObjectType
 from ..utils import sort_argument_for_model, sort_enum_for_model
-from .models import Article, Base, Editor, Pet, Reporter, Hairkind
-
-db = create_engine("sqlite:///test_sqlalchemy.sqlite3")
-
-
-@pytest.yield_fixture(scope="function")
-def session():
-    reset_global_registry()
-    connection = db.engine.connect()
-    transaction = connection.begin()
-    Base.metadata.create_all(connection)
-
-    # options = dict(bind=connection, binds={})
-    session_factory = sessionmaker(bind=connection)
-    session = scoped_session(session_factory)
-
-    yield session
-
-    # Finalize test here
-    transaction.rollback()
-    connection.close()
-    session.remove()
+from .models import Article, Editor, Pet, Reporter, Hairkind
+from .utils import count_queries
 
 
 def setup_fixtures(session):
@@ -556,3 +533,260 @@ def test_sort(session):
             node["node"]["name"] for node in expectedNoSort[key]["edges"]
         )
 
+
+def get_count_schema(field_class=SQLAlchemyConnectionField):
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Pet
+            interfaces = (Node,)
+
+    class PetConnection(Connection):
+        class Meta:
+            node = PetNode
+
+        total_count = graphene.Int()
+
+        def resolve_total_count(self, info):
+            return self.length
+
+    class Query(graphene.ObjectType):
+        pets = field_class(PetConnection)
+
+    return graphene.Schema(query=Query)
+
+
+def test_connection_without_count(session):
+    sort_setup(session)
+    schema = get_count_schema()
+    query = """
+        query ($after: String) {
+          pets(first: 2, after: $after) {
+            pageInfo {
+              hasNextPage
+              endCursor
+            }
+            edges {
+              node {
+                name
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 1
+    assert "count(" not in statements[0]
+    pets = result.data["pets"]
+    assert [edge["node"]["name"] for edge in pets["edges"]] == ["Lassie", "Barf"]
+    assert pets["pageInfo"]["hasNextPage"]
+
+    result = schema.execute(
+        query,
+        variables={"after": pets["pageInfo"]["endCursor"]},
+        context_value={"session": session},
+    )
+    assert not result.errors
+    pets = result.data["pets"]
+    assert [edge["node"]["name"] for edge in pets["edges"]] == ["Alf"]
+    assert not pets["pageInfo"]["hasNextPage"]
+
+
+def test_connection_empty_range(session):
+    sort_setup(session)
+
+    class BakedConnectionField(SQLAlchemyConnectionField):
+        baked_queries = True
+
+    query = """
+        query ($after: String, $before: String) {
+          pets(after: $after, before: $before) {
+            pageInfo {
+              hasNextPage
+            }
+            edges {
+              node {
+                name
+              }
+            }
+          }
+        }
+    """
+    # `before` isn't after `after`
+    variables = {"after": offset_to_cursor(2), "before": offset_to_cursor(1)}
+    for field_class in (SQLAlchemyConnectionField, BakedConnectionField):
+        schema = get_count_schema(field_class)
+        with count_queries(session) as statements:
+            result = schema.execute(
+                query, variables=variables, context_value={"session": session}
+            )
+        assert not result.errors
+        assert result.data["pets"] == {
+            "pageInfo": {"hasNextPage": False},
+            "edges": [],
+        }
+        assert statements == []
+
+
+class MemoConnectionField(SQLAlchemyConnectionField):
+    memoize_queries = True
+
+
+def test_connection_with_count(session):
+    sort_setup(session)
+    schema = get_count_schema(MemoConnectionField)
+    query = """
+        query {
+          pets(first: 2) {
+            totalCount
+            pageInfo {
+              hasNextPage
+            }
+          }
+          last: pets(last: 1) {
+            edges {
+              node {
+                name
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    # Both fields count the same query, which is only counted once
+    assert len([statement for statement in statements if "count(" in statement]) == 1
+    assert result.data["pets"] == {"totalCount": 3, "pageInfo": {"hasNextPage": True}}
+    assert result.data["last"] == {"edges": [{"node": {"name": "Alf"}}]}
+
+
+class WindowCountConnectionField(SQLAlchemyConnectionField):
+    window_count = True
+
+
+def test_connection_with_window_count(session):
+    sort_setup(session)
+    schema = get_count_schema(WindowCountConnectionField)
+    query = """
+        query ($after: String) {
+          pets(first: 2, after: $after) {
+            totalCount
+            pageInfo {
+              hasNextPage
+              endCursor
+            }
+            edges {
+              node {
+                name
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 1
+    assert "count(*) OVER ()" in statements[0]
+    pets = result.data["pets"]
+    assert pets["totalCount"] == 3
+    assert pets["pageInfo"]["hasNextPage"]
+    assert [edge["node"]["name"] for edge in pets["edges"]] == ["Lassie", "Barf"]
+
+    result = schema.execute(
+        query,
+        variables={"after": pets["pageInfo"]["endCursor"]},
+        context_value={"session": session},
+    )
+    assert not result.errors
+    pets = result.data["pets"]
+    assert pets["totalCount"] == 3
+    assert not pets["pageInfo"]["hasNextPage"]
+    assert [edge["node"]["name"] for edge in pets["edges"]] == ["Alf"]
+
+    # Past the last page, the total is counted separately
+    with count_queries(session) as statements:
+        result = schema.execute(
+            query,
+            variables={"after": pets["pageInfo"]["endCursor"]},
+            context_value={"session": session},
+        )
+    assert not result.errors
+    assert len(statements) == 2
+    assert result.data["pets"]["totalCount"] == 3
+    assert result.data["pets"]["edges"] == []
+
+    # So is the total of an empty range
+    result = schema.execute(
+        "query { pets(first: 0) { totalCount edges { cursor } } }",
+        context_value={"session": session},
+    )
+    assert not result.errors
+    assert result.data["pets"] == {"totalCount": 3, "edges": []}
+
+
+def test_relationship_connection_paginated_by_database(session):
+    reporter = Reporter(first_name="ABA")
+    session.add(reporter)
+    for i in range(3):
+        session.add(Article(headline="Article_{}".format(i), reporter=reporter))
+    session.commit()
+    session.expunge_all()
+
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+    class Query(graphene.ObjectType):
+        reporters = SQLAlchemyConnectionField(ReporterConnection)
+
+    schema = graphene.Schema(query=Query)
+    query = """
+        query {
+          reporters {
+            edges {
+              node {
+                articles(first: 1, after: "YXJyYXljb25uZWN0aW9uOjA=") {
+                  pageInfo {
+                    hasNextPage
+                  }
+                  edges {
+                    node {
+                      headline
+                    }
+                  }
+                }
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 2
+    assert "LIMIT" in statements[1]
+    assert "count(" not in statements[1]
+    articles = result.data["reporters"]["edges"][0]["node"]["articles"]
+    assert articles == {
+        "pageInfo": {"hasNextPage": True},
+        "edges": [{"node": {"headline": "Article_1"}}],
+    }
+    # The collection itself was never loaded
+    assert "articles" in inspect(session.query(Reporter).one()).unloaded
@@ -0,0 +1,259 @@
+import graphene
+from graphene.relay import Connection, Node
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from ..fields import NodeField, SQLAlchemyConnectionField
+from ..types import SQLAlchemyObjectType
+from .models import Article, Reporter
+from .utils import count_queries
+
+
+def setup_fixtures(session):
+    for i in range(3):
+        reporter = Reporter(first_name="Reporter_{}".format(i))
+        session.add(reporter)
+        session.add(Article(headline="Article_{}".format(i), reporter=reporter))
+    session.commit()
+    session.expunge_all()
+
+
+def get_schema(read_only_field=True):
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            read_only = True
+            skip_registry = True
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+    class ReadOnlyConnectionField(SQLAlchemyConnectionField):
+        read_only = read_only_field
+
+    class Query(graphene.ObjectType):
+        reporters = ReadOnlyConnectionField(ReporterConnection)
+        all_reporters = graphene.List(ReporterType)
+
+        def resolve_all_reporters(self, info):
+            return ReporterType.get_query(info).order_by(Reporter.id).all()
+
+    return graphene.Schema(query=Query)
+
+
+query = """
+    query {
+      reporters(first: 2) {
+        edges {
+          node {
+            firstName
+            articles(first: 1) {
+              edges {
+                node {
+                  headline
+                }
+              }
+            }
+          }
+        }
+      }
+    }
+"""
+
+
+def get_loaded_reporters(session):
+    return [
+        instance for instance in session.identity_map.values()
+        if isinstance(instance, Reporter)
+    ]
+
+
+def execute(session, schema, query):
+    result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    return result.data
+
+
+def test_read_only_connection(session):
+    setup_fixtures(session)
+    data = execute(session, get_schema(), query)
+    assert data["reporters"]["edges"] == [
+        {
+            "node": {
+                "firstName": "Reporter_{}".format(i),
+                "articles": {"edges": [{"node": {"headline": "Article_{}".format(i)}}]},
+            }
+        }
+        for i in range(2)
+    ]
+    # The reporters were released with the results
+    assert get_loaded_reporters(session) == []
+
+    loaded = []
+
+    def on_load(instance, context):
+        loaded.append(context.session)
+
+    event.listen(Reporter, "load", on_load)
+    try:
+        execute(session, get_schema(read_only_field=False), query)
+    finally:
+        event.remove(Reporter, "load", on_load)
+    # Without read_only, they are loaded by the session of the request
+    assert loaded == [session()] * 3
+
+
+def test_read_only_with_pending_changes(session):
+    setup_fixtures(session)
+    reporter = Reporter(first_name="Reporter_X")
+    session.add(reporter)
+    data = execute(session, get_schema(), "query { reporters { edges { node { firstName } } } }")
+    assert len(data["reporters"]["edges"]) == 4
+    # Flushed by the session of the request, which loaded the page
+    assert reporter.id is not None
+
+
+def test_read_only_get_query(session):
+    setup_fixtures(session)
+    data = execute(session, get_schema(), "query { allReporters { firstName } }")
+    assert data["allReporters"] == [
+        {"firstName": "Reporter_{}".format(i)} for i in range(3)
+    ]
+    assert get_loaded_reporters(session) == []
+
+
+def test_read_only_get_query_session_closed(session):
+    setup_fixtures(session)
+
+    class ReporterType(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            read_only = True
+
+    loaded = []
+
+    class Query(graphene.ObjectType):
+        all_reporters = graphene.List(ReporterType)
+
+        def resolve_all_reporters(self, info):
+            reporters = ReporterType.get_query(info).all()
+            loaded.extend(reporters)
+            return reporters
+
+    execute(session, graphene.Schema(query=Query), "query { allReporters { firstName } }")
+    assert len(loaded) == 3
+    assert loaded[0] not in session
+    # The queries of the transaction share one read-only session
+    execute(session, graphene.Schema(query=Query), "query { allReporters { firstName } }")
+    assert len(loaded) == 6
+    assert object_session(loaded[3]) is object_session(loaded[0])
+    # Closed at the end of the transaction of the session of the request
+    assert object_session(loaded[0]) is not None
+    session.commit()
+    assert object_session(loaded[0]) is None
+
+
+def test_read_only_get_node_batched(session):
+    setup_fixtures(session)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            read_only = True
+
+    class Query(graphene.ObjectType):
+        node = NodeField()
+
+    schema = graphene.Schema(query=Query, types=[ReporterNode])
+    query = """
+        query ($a: ID!, $b: ID!) {
+          a: node(id: $a) {
+            ... on ReporterNode {
+              firstName
+            }
+          }
+          b: node(id: $b) {
+            ... on ReporterNode {
+              firstName
+            }
+          }
+        }
+    """
+    loaded = []
+
+    def on_load(instance, context):
+        loaded.append(instance)
+
+    event.listen(Reporter, "load", on_load)
+    try:
+        with count_queries(session) as statements:
+            result = schema.execute(
+                query,
+                variables={
+                    "a": Node.to_global_id("ReporterNode", 1),
+                    "b": Node.to_global_id("ReporterNode", 2),
+                },
+                context_value={"session": session},
+            )
+    finally:
+        event.remove(Reporter, "load", on_load)
+    assert not result.errors
+    assert result.data == {
+        "a": {"firstName": "Reporter_0"},
+        "b": {"firstName": "Reporter_1"},
+    }
+    assert len(statements) == 1
+    assert len(loaded) == 2
+    assert not any(instance in session for instance in loaded)
+
+
+def test_read_only_get_node_in_mutation(session):
+    setup_fixtures(session)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            read_only = True
+
+    class RenameReporter(graphene.Mutation):
+        class Arguments:
+            id = graphene.ID(required=True)
+            first_name = graphene.String(required=True)
+
+        reporter = graphene.Field(ReporterNode)
+
+        def mutate(self, info, id, first_name):
+            reporter = ReporterNode.get_node(info, id)
+            reporter.first_name = first_name
+            session.commit()
+            return RenameReporter(reporter=reporter)
+
+    class Query(graphene.ObjectType):
+        node = NodeField()
+
+    class Mutation(graphene.ObjectType):
+        rename_reporter = RenameReporter.Field()
+
+    schema = graphene.Schema(query=Query, mutation=Mutation)
+    data = execute(
+        session,
+        schema,
+        'mutation { renameReporter(id: 2, firstName: "B") { reporter { firstName } } }',
+    )
+    assert data["renameReporter"]["reporter"] == {"firstName": "B"}
+    # The node belonged to the session of the request, which saved it
+    session.expunge_all()
+    assert session.query(Reporter).get(2).first_name == "B"
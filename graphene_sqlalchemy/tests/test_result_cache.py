@@ -0,0 +1,171 @@
+import graphene
+from graphene.relay import Connection, Node
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from ..fields import SQLAlchemyConnectionField
+from ..result_cache import ResultCache, get_tables
+from ..types import SQLAlchemyObjectType
+from .models import Base, Hairkind, Pet, Reporter
+from .utils import count_queries
+
+
+def add_pets(session, *names):
+    for name in names:
+        session.add(Pet(name=name, pet_kind="dog", hair_kind=Hairkind.LONG))
+    session.commit()
+
+
+def get_schema(key_prefix=None):
+    class PetNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Pet
+            interfaces = (Node,)
+
+    class PetConnection(Connection):
+        class Meta:
+            node = PetNode
+
+        total_count = graphene.Int()
+
+        def resolve_total_count(self, info):
+            return self.length
+
+    class CachedConnectionField(SQLAlchemyConnectionField):
+        result_cache = ResultCache(maxsize=16, ttl=60, key_prefix=key_prefix)
+
+    class Query(graphene.ObjectType):
+        pets = CachedConnectionField(PetConnection)
+
+    return graphene.Schema(query=Query)
+
+
+query = """
+    query ($first: Int) {
+      pets(first: $first) {
+        totalCount
+        pageInfo {
+          hasNextPage
+        }
+        edges {
+          node {
+            id
+            name
+          }
+        }
+      }
+    }
+"""
+
+
+def execute(schema, session, first=2, **context):
+    result = schema.execute(
+        query, variables={"first": first}, context_value=dict(context, session=session)
+    )
+    assert not result.errors
+    return result.data["pets"]
+
+
+def test_get_tables():
+    query = Session().query(Reporter).join(Reporter.pets)
+    assert [table.name for table in get_tables(query)] == [
+        "association",
+        "pets",
+        "reporters",
+    ]
+
+
+def test_result_cache_across_sessions(session):
+    add_pets(session, "Lassie", "Barf", "Alf")
+    schema = get_schema()
+
+    with count_queries(session) as statements:
+        pets = execute(schema, session)
+    assert len(statements) == 2
+    assert pets["totalCount"] == 3
+    assert pets["pageInfo"] == {"hasNextPage": True}
+    assert [edge["node"]["name"] for edge in pets["edges"]] == ["Lassie", "Barf"]
+
+    # Another request, with its own session, is served from the cache
+    other = Session(bind=session.connection())
+    with count_queries(session) as statements:
+        assert execute(schema, other) == pets
+    assert statements == []
+    # The rows are persistent instances of the session of the request
+    lassie = other.query(Pet).filter_by(name="Lassie").one()
+    assert lassie in other
+
+    # Other pagination arguments are cached separately
+    with count_queries(session) as statements:
+        assert len(execute(schema, other, first=1)["edges"]) == 1
+    assert len(statements) == 2
+
+
+def test_result_cache_invalidated_by_commit(session):
+    add_pets(session, "Lassie", "Barf", "Alf")
+    schema = get_schema()
+    execute(schema, session, first=5)
+
+    add_pets(session, "Garfield")
+    with count_queries(session) as statements:
+        pets = execute(schema, session, first=5)
+    assert len(statements) == 2
+    assert pets["totalCount"] == 4
+    assert [edge["node"]["name"] for edge in pets["edges"]] == [
+        "Lassie",
+        "Barf",
+        "Alf",
+        "Garfield",
+    ]
+
+
+def test_result_cache_uncommitted_changes(tmpdir):
+    engine = create_engine("sqlite:///{}".format(tmpdir.join("pets.sqlite3")))
+    Base.metadata.create_all(engine)
+    session = Session(bind=engine)
+    add_pets(session, "Lassie", "Barf", "Alf")
+    schema = get_schema()
+    session.add(Pet(name="Garfield", pet_kind="cat", hair_kind=Hairkind.SHORT))
+    session.flush()
+    # Read with the flushed changes, not cached
+    assert execute(schema, session, first=5)["totalCount"] == 4
+    with count_queries(session) as statements:
+        assert execute(schema, session, first=5)["totalCount"] == 4
+    assert len(statements) == 2
+
+    session.rollback()
+    with count_queries(session) as statements:
+        assert execute(schema, session, first=5)["totalCount"] == 3
+    assert len(statements) == 2
+    session.close()
+
+
+def test_result_cache_per_database(tmpdir):
+    schema = get_schema()
+    sessions = []
+    for tenant in ("acme", "globex"):
+        engine = create_engine("sqlite:///{}".format(tmpdir.join(tenant + ".sqlite3")))
+        Base.metadata.create_all(engine)
+        session = Session(bind=engine)
+        add_pets(session, "{}-secret".format(tenant))
+        sessions.append(session)
+
+    for session, name in zip(sessions, ["acme-secret", "globex-secret"]):
+        pets = execute(schema, session)
+        assert [edge["node"]["name"] for edge in pets["edges"]] == [name]
+        session.close()
+
+
+def test_result_cache_key_prefix(session):
+    add_pets(session, "Lassie", "Barf", "Alf")
+    schema = get_schema(key_prefix=lambda info: info.context["tenant"])
+    execute(schema, session, tenant="acme")
+    # Ends the request
+    session.commit()
+
+    with count_queries(session) as statements:
+        execute(schema, session, tenant="acme")
+    assert statements == []
+    with count_queries(session) as statements:
+        execute(schema, session, tenant="globex")
+    assert len(statements) == 2
@@ -0,0 +1,130 @@
+import graphene
+from graphene.relay import Connection, Node
+
+from ..fields import SQLAlchemyConnectionField
+from ..rows import Row, get_row_class
+from ..types import SQLAlchemyObjectType
+from .models import Article, Reporter
+from .utils import count_queries
+
+
+def setup_fixtures(session):
+    for i in range(3):
+        reporter = Reporter(first_name="Reporter_{}".format(i), email="r{}@x".format(i))
+        session.add(reporter)
+        session.add(Article(headline="Article_{}".format(i), reporter=reporter))
+    session.commit()
+    session.expunge_all()
+
+
+def get_schema():
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+        display_name = graphene.String()
+
+        def resolve_display_name(self, info):
+            return self.first_name.upper()
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+        total_count = graphene.Int()
+
+        def resolve_total_count(self, info):
+            return self.length
+
+    class RowsConnectionField(SQLAlchemyConnectionField):
+        leaf_rows = True
+
+    class Query(graphene.ObjectType):
+        reporters = RowsConnectionField(ReporterConnection)
+
+    return graphene.Schema(query=Query)
+
+
+def execute(session, query, **variables):
+    result = get_schema().execute(
+        query, variables=variables, context_value={"session": session}
+    )
+    assert not result.errors
+    return result.data["reporters"]
+
+
+def test_row_class():
+    row_class = get_row_class(Reporter, ["id", "first_name"])
+    assert get_row_class(Reporter, ("id", "first_name")) is row_class
+    row = row_class((1, "ABA"))
+    assert isinstance(row, Row)
+    assert (row.id, row.first_name) == (1, "ABA")
+    assert not hasattr(row, "__dict__")
+
+
+def test_leaf_selection_fetches_rows(session):
+    setup_fixtures(session)
+    query = """
+        query ($last: Int) {
+          reporters(first: 2, last: $last, sort: first_name_desc) {
+            totalCount
+            edges {
+              node {
+                __typename
+                id
+                firstName
+              }
+            }
+          }
+        }
+    """
+    with count_queries(session) as statements:
+        reporters = execute(session, query)
+    assert reporters == {
+        "totalCount": 3,
+        "edges": [
+            {
+                "node": {
+                    "__typename": "ReporterNode",
+                    "id": Node.to_global_id("ReporterNode", i),
+                    "firstName": "Reporter_{}".format(i - 1),
+                }
+            }
+            for i in (3, 2)
+        ],
+    }
+    # Only the selected columns are fetched, and no instance is built
+    assert "reporters.email" not in statements[0]
+    assert len(session.identity_map) == 0
+
+    reporters = execute(session, query, last=1)
+    assert [edge["node"]["firstName"] for edge in reporters["edges"]] == ["Reporter_1"]
+    assert len(session.identity_map) == 0
+
+
+def test_other_selections_fetch_instances(session):
+    setup_fixtures(session)
+    for field in ("articles { edges { node { headline } } }", "displayName"):
+        query = """
+            query {
+              reporters(first: 1) {
+                edges {
+                  node {
+                    firstName
+                    %s
+                  }
+                }
+              }
+            }
+        """ % field
+        with count_queries(session) as statements:
+            reporters = execute(session, query)
+        assert reporters["edges"][0]["node"]["firstName"] == "Reporter_0"
+        # Every column of the instances is fetched
+        assert "reporters.email" in statements[0]
@@ -0,0 +1,226 @@
+import graphene
+from graphene.relay import Connection, Node
+
+from ..fields import SQLAlchemyConnectionField
+from ..selection import eager_load
+from ..types import SQLAlchemyObjectType
+from .models import Article, Hairkind, Pet, Reporter
+from .utils import count_queries
+
+
+def setup_fixtures(session):
+    for i in range(3):
+        reporter = Reporter(first_name="Reporter_{}".format(i))
+        session.add(reporter)
+        for j in range(2):
+            session.add(Article(headline="Article_{}_{}".format(i, j), reporter=reporter))
+            pet = Pet(name="Pet_{}_{}".format(i, j), pet_kind="dog", hair_kind=Hairkind.LONG)
+            pet.reporters.append(reporter)
+            session.add(pet)
+    session.commit()
+    session.expunge_all()
+
+
+def get_schema(session):
+    class PetType(SQLAlchemyObjectType):
+        class Meta:
+            model = Pet
+
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+    class Query(graphene.ObjectType):
+        all_reporters = SQLAlchemyConnectionField(ReporterConnection)
+        reporters = graphene.List(ReporterNode)
+
+        def resolve_reporters(self, info):
+            return eager_load(session.query(Reporter), info).all()
+
+    return graphene.Schema(query=Query)
+
+
+def test_connection_eager_loads_selection(session):
+    setup_fixtures(session)
+    schema = get_schema(session)
+    query = """
+        query {
+          allReporters {
+            edges {
+              node {
+                ...ReporterFields
+              }
+            }
+          }
+        }
+
+        fragment ReporterFields on ReporterNode {
+          firstName
+          pets {
+            name
+          }
+          ... on ReporterNode {
+            articles {
+              edges {
+                node {
+                  headline
+                  reporter {
+                    firstName
+                  }
+                }
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    # reporters, pets and the page of articles (+ reporter joined) of each reporter
+    assert len(statements) == 5
+    assert len(result.data["allReporters"]["edges"]) == 3
+    for edge in result.data["allReporters"]["edges"]:
+        node = edge["node"]
+        assert len(node["pets"]) == 2
+        assert len(node["articles"]["edges"]) == 2
+        for article in node["articles"]["edges"]:
+            assert article["node"]["reporter"] == {"firstName": node["firstName"]}
+
+
+def test_eager_load_helper(session):
+    setup_fixtures(session)
+    schema = get_schema(session)
+    query = """
+        query {
+          reporters {
+            firstName
+            pets {
+              name
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 2
+    assert [len(reporter["pets"]) for reporter in result.data["reporters"]] == [2, 2, 2]
+
+
+def test_eager_load_without_relationships(session):
+    setup_fixtures(session)
+    schema = get_schema(session)
+    query = """
+        query {
+          reporters {
+            firstName
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert len(statements) == 1
+
+
+def get_projection_schema(session):
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+            projection = True
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+            projection = True
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        all_reporters = SQLAlchemyConnectionField(ReporterConnection)
+
+    return graphene.Schema(query=Query)
+
+
+def test_connection_projection(session):
+    setup_fixtures(session)
+    schema = get_projection_schema(session)
+    query = """
+        query {
+          allReporters {
+            edges {
+              node {
+                firstName
+                articles {
+                  edges {
+                    node {
+                      headline
+                    }
+                  }
+                }
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    reporters, articles = statements[0], statements[1:]
+    assert "reporters.first_name" in reporters
+    assert "reporters.last_name" not in reporters
+    assert "reporters.email" not in reporters
+    assert len(articles) == 3
+    for statement in articles:
+        assert "articles.headline" in statement
+        assert "articles.pub_date" not in statement
+    assert [
+        sorted(article["node"]["headline"] for article in edge["node"]["articles"]["edges"])
+        for edge in result.data["allReporters"]["edges"]
+    ] == [["Article_{}_{}".format(i, j) for j in range(2)] for i in range(3)]
+
+
+def test_projection_keeps_keys(session):
+    setup_fixtures(session)
+    schema = get_projection_schema(session)
+    query = """
+        query {
+          node(id: "QXJ0aWNsZU5vZGU6MQ==") {
+            id
+            ... on ArticleNode {
+              reporter {
+                firstName
+              }
+            }
+          }
+        }
+    """
+
+    with count_queries(session) as statements:
+        result = schema.execute(query, context_value={"session": session})
+    assert not result.errors
+    assert "articles.id" in statements[0]
+    assert "articles.reporter_id" in statements[0]
+    assert "articles.headline" not in statements[0]
+    assert result.data == {
+        "node": {"id": "QXJ0aWNsZU5vZGU6MQ==", "reporter": {"firstName": "Reporter_0"}}
+    }
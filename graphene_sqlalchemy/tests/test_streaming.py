@@ -0,0 +1,131 @@
+import graphene
+from graphene.relay import Connection, Node
+
+from ..fields import SQLAlchemyConnectionField
+from ..types import SQLAlchemyObjectType
+from .models import Article, Reporter
+from .utils import count_queries
+
+
+def setup_fixtures(session):
+    for i in range(10):
+        reporter = Reporter(first_name="Reporter_{}".format(i))
+        session.add(reporter)
+        session.add(Article(headline="Article_{}".format(i), reporter=reporter))
+    session.commit()
+    session.expunge_all()
+
+
+def get_schema(session, tracked):
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+        def resolve_first_name(self, info):
+            tracked.append(len(session.identity_map))
+            return self.first_name
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+        total_count = graphene.Int()
+
+        def resolve_total_count(self, info):
+            return self.length
+
+    class StreamedConnectionField(SQLAlchemyConnectionField):
+        stream_chunk_size = 2
+
+    class Query(graphene.ObjectType):
+        reporters = StreamedConnectionField(ReporterConnection)
+
+    return graphene.Schema(query=Query)
+
+
+def execute(session, query, **variables):
+    tracked = []
+    result = get_schema(session, tracked).execute(
+        query, variables=variables, context_value={"session": session}
+    )
+    assert not result.errors
+    return result.data["reporters"], tracked
+
+
+def test_streamed_connection(session):
+    setup_fixtures(session)
+    query = """
+        query ($first: Int, $after: String) {
+          reporters(first: $first, after: $after) {
+            totalCount
+            pageInfo {
+              hasNextPage
+              endCursor
+            }
+            edges {
+              cursor
+              node {
+                firstName
+              }
+            }
+          }
+        }
+    """
+    with count_queries(session) as statements:
+        reporters, tracked = execute(session, query, first=8)
+    assert len(statements) == 2
+    assert reporters["totalCount"] == 10
+    assert reporters["pageInfo"] == {
+        "hasNextPage": True,
+        "endCursor": reporters["edges"][-1]["cursor"],
+    }
+    assert [edge["node"]["firstName"] for edge in reporters["edges"]] == [
+        "Reporter_{}".format(i) for i in range(8)
+    ]
+    # The instances are released as the edges are serialized
+    assert max(tracked) <= 2
+    assert len(session.identity_map) == 0
+
+    reporters, _ = execute(session, query, after=reporters["pageInfo"]["endCursor"])
+    assert reporters["pageInfo"]["hasNextPage"] is False
+    assert [edge["node"]["firstName"] for edge in reporters["edges"]] == [
+        "Reporter_8",
+        "Reporter_9",
+    ]
+
+
+def test_streamed_connection_edges_only(session):
+    setup_fixtures(session)
+    query = "query { reporters(first: 3) { edges { node { firstName } } } }"
+    with count_queries(session) as statements:
+        reporters, _ = execute(session, query)
+    # Nothing to count
+    assert len(statements) == 1
+    assert len(reporters["edges"]) == 3
+
+
+def test_eager_loading_not_streamed(session):
+    setup_fixtures(session)
+    query = """
+        query {
+          reporters(first: 3) {
+            edges {
+              node {
+                firstName
+                favoriteArticle {
+                  headline
+                }
+              }
+            }
+          }
+        }
+    """
+    reporters, tracked = execute(session, query)
+    assert len(reporters["edges"]) == 3
+    assert min(tracked) >= 3
@@ -1,6 +1,7 @@
 from collections import OrderedDict
-from graphene import Field, Int, Interface, ObjectType
+from graphene import Field, GlobalID, Int, Interface, ObjectType, Schema
 from graphene.relay import Node, is_node, Connection
+import pytest
 import six
 from promise import Promise
 
@@ -181,3 +182,62 @@ def test_promise_connection_resolver():
         resolver, TestConnection, ReporterWithCustomOptions, None, None
     )
     assert result is not None
+
+
+def test_is_type_of():
+    assert Character.is_type_of(Reporter(), None)
+    assert not Character.is_type_of(Article(), None)
+    assert Character.is_type_of(Character(), None)
+    assert Character._meta.accepted_types[Article] is False
+
+    class NotMapped(object):
+        pass
+
+    with pytest.raises(Exception, match="Received incompatible instance"):
+        Character.is_type_of(NotMapped(), None)
+    assert Character._meta.accepted_types[NotMapped] is None
+
+
+def test_lazy_fields():
+    lazy_registry = Registry()
+
+    class LazyReporter(SQLAlchemyObjectType):
+        column_prop = Int()
+
+        class Meta:
+            model = Reporter
+            registry = lazy_registry
+            interfaces = (Node,)
+            lazy_fields = True
+
+    class LazyArticle(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            registry = lazy_registry
+            lazy_fields = True
+
+    # Nothing is converted until the fields are read
+    assert LazyReporter._meta.fields._construct is not None
+
+    class Query(ObjectType):
+        reporter = Field(LazyReporter)
+
+    schema = Schema(query=Query)
+    fields = LazyReporter._meta.fields
+    assert fields._construct is None
+    assert list(fields.keys()) == [
+        "id",
+        "first_name",
+        "last_name",
+        "email",
+        "pets",
+        "articles",
+        "favorite_article",
+        "column_prop",
+    ]
+    # The declared fields override the converted ones
+    assert isinstance(fields["id"], GlobalID)
+    assert fields["column_prop"].type is Int
+    # Types reachable through relationships are converted by the schema too
+    assert LazyArticle._meta.fields._construct is None
+    assert "headline" in schema.get_type("LazyArticle").fields
@@ -1,7 +1,17 @@
 from graphene import Enum, List, ObjectType, Schema, String
 import sqlalchemy as sa
 
-from ..utils import get_session, sort_enum_for_model, sort_argument_for_model
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.declarative import declarative_base
+
+from ..utils import (
+    get_id_getter,
+    get_session,
+    primary_key_from_id,
+    sort_enum_for_model,
+    sort_argument_for_model,
+    supports_window_functions,
+)
 from .models import Pet, Editor
 
 
@@ -73,3 +83,45 @@ def test_sort_argument_for_model_multiple_pk():
     assert set(arg.default_value) == set(
         (MultiplePK.foo.name + "_asc", MultiplePK.bar.name + "_asc")
     )
+
+
+def test_id_getter():
+    editor = Editor(editor_id=1)
+    assert get_id_getter(Editor)(editor) == 1
+    assert primary_key_from_id(Editor, "1") == (1,)
+    assert primary_key_from_id(Editor, "x") is None
+
+
+def test_composite_id():
+    Base = declarative_base()
+
+    class Membership(Base):
+        __tablename__ = "memberships"
+        group = sa.Column(sa.String(30), primary_key=True)
+        user_id = sa.Column(sa.Integer(), primary_key=True)
+
+    id = get_id_getter(Membership)(Membership(group="admins", user_id=2))
+    assert id == '["admins",2]'
+    assert primary_key_from_id(Membership, id) == ("admins", 2)
+    assert primary_key_from_id(Membership, ("admins", "2")) == ("admins", 2)
+    assert primary_key_from_id(Membership, "(admins, 2)") is None
+    assert primary_key_from_id(Membership, '["admins"]') is None
+
+
+def test_supports_window_functions():
+    def get_dialect(dialect, version, **attributes):
+        dialect = dialect.dialect()
+        dialect.server_version_info = version
+        dialect.__dict__.update(attributes)
+        return dialect
+
+    assert supports_window_functions(get_dialect(postgresql, (9, 6)))
+    assert supports_window_functions(get_dialect(sqlite, (3, 25, 0)))
+    assert not supports_window_functions(get_dialect(sqlite, (3, 22, 0)))
+    assert supports_window_functions(get_dialect(mysql, (8, 0, 21)))
+    assert not supports_window_functions(get_dialect(mysql, (5, 7, 30)))
+    assert supports_window_functions(get_dialect(mysql, (10, 3, 22, "MariaDB")))
+    assert not supports_window_functions(get_dialect(mysql, (10, 1, 44, "MariaDB")))
+    assert not supports_window_functions(
+        get_dialect(mysql, (10, 1, 44), is_mariadb=True)
+    )
@@ -0,0 +1,102 @@
+import types
+
+import graphene
+from graphene.relay import Connection, Node
+
+from ..bakery import BAKED_QUERIES, bakery
+from ..fields import SQLAlchemyConnectionField
+from ..types import LazyFields, SQLAlchemyObjectType
+from ..warmup import warmup
+from .models import Article, Pet, Reporter
+
+
+def get_schema():
+    class ArticleNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Article
+            interfaces = (Node,)
+            lazy_fields = True
+
+    class ReporterNode(SQLAlchemyObjectType):
+        class Meta:
+            model = Reporter
+            interfaces = (Node,)
+
+    class ReporterConnection(Connection):
+        class Meta:
+            node = ReporterNode
+
+    class BakedConnectionField(SQLAlchemyConnectionField):
+        baked_queries = True
+
+    class Query(graphene.ObjectType):
+        node = Node.Field()
+        reporters = BakedConnectionField(ReporterConnection)
+
+    return graphene.Schema(query=Query)
+
+
+def get_baked_keys():
+    # The bakery also caches the SQL compiled for each dialect
+    return set(key for key in bakery.cache if isinstance(key[0], types.CodeType))
+
+
+def test_warmup(session):
+    session.add(Reporter(first_name="ABA"))
+    session.add(Reporter(first_name="ABO"))
+    session.commit()
+    session.expunge_all()
+    schema = get_schema()
+
+    bakery.cache.clear()
+    warmup(schema, session)
+    baked_keys = get_baked_keys()
+    # Only baked with SQLAlchemy 1.3
+    assert bool(baked_keys) == BAKED_QUERIES
+
+    reporter_type = schema.get_type("ReporterNode").graphene_type
+    article_type = schema.get_type("ArticleNode").graphene_type
+    assert reporter_type._meta.accepted_types == {Reporter: True, Article: False}
+    assert article_type._meta.accepted_types == {Article: True, Reporter: False}
+    assert Pet not in reporter_type._meta.accepted_types
+    assert isinstance(article_type._meta.fields, LazyFields)
+    assert "headline" in dict(article_type._meta.fields.items())
+
+    query = """
+        query ($after: String, $id: ID!) {
+          reporters(first: 1, after: $after) {
+            pageInfo {
+              endCursor
+            }
+            edges {
+              node {
+                firstName
+              }
+            }
+          }
+          node(id: $id) {
+            ... on ReporterNode {
+              firstName
+            }
+          }
+        }
+    """
+    after = None
+    for first_name, node_id in (("ABA", 2), ("ABO", 1)):
+        result = schema.execute(
+            query,
+            variables={
+                "after": after,
+                "id": Node.to_global_id("ReporterNode", node_id),
+            },
+            context_value={"session": session},
+        )
+        assert not result.errors
+        reporters = result.data["reporters"]
+        assert reporters["edges"] == [{"node": {"firstName": first_name}}]
+        assert result.data["node"] == {"firstName": "ABO" if node_id == 2 else "ABA"}
+        after = reporters["pageInfo"]["endCursor"]
+        session.expunge_all()
+
+    # The queries of the requests were compiled by the warmup
+    assert get_baked_keys() == baked_keys
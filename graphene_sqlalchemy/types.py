@@ -2,7 +2,7 @@ from collections import OrderedDict
 
 from sqlalchemy.inspection import inspect as sqlalchemyinspect
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.orm import load_only
 
 from graphene import Field  # , annotate, ResolveInfo
 from graphene.relay import Connection, Node
@@ -15,11 +15,22 @@ from .converter import (
     convert_sqlalchemy_relationship,
     convert_sqlalchemy_hybrid_method,
 )
+from .batching import get_baked_node_loader, get_node_loader
 from .registry import Registry, get_global_registry
-from .utils import get_query, is_mapped_class, is_mapped_instance
+from .rows import Row
+from .selection import get_projected_columns, load_selected_columns
+from .utils import (
+    get_id_getter,
+    get_query,
+    get_query_pool,
+    get_session,
+    get_transaction_read_only_session,
+    is_mapped_class,
+    primary_key_from_id,
+)
 
 
-def construct_fields(model, registry, only_fields, exclude_fields):
+def construct_fields(model, registry, only_fields, exclude_fields, batching=False, obj_type=None):
     inspected_model = sqlalchemyinspect(model)
 
     fields = OrderedDict()
@@ -72,18 +83,102 @@ def construct_fields(model, registry, only_fields, exclude_fields):
             # We skip this field if we specify only_fields and is not
             # in there. Or when we exclude this field in exclude_fields
             continue
-        converted_relationship = convert_sqlalchemy_relationship(relationship, registry)
+        converted_relationship = convert_sqlalchemy_relationship(
+            relationship, registry, batching, obj_type
+        )
         name = relationship.key
         fields[name] = converted_relationship
 
     return fields
 
 
+class LazyFields(OrderedDict):
+    """Fields of a type computed by ``construct`` the first time they are
+    read. The fields set before that (the ones declared on the type) are
+    kept, and override the constructed ones."""
+
+    def __init__(self, construct):
+        super(LazyFields, self).__init__()
+        self._construct = construct
+
+    def construct(self):
+        construct = self._construct
+        if construct is None:
+            return
+        self._construct = None
+        declared = list(OrderedDict.items(self))
+        OrderedDict.clear(self)
+        OrderedDict.update(self, construct())
+        OrderedDict.update(self, declared)
+
+    def __bool__(self):
+        # Not constructed for the truth tests of graphene at class creation
+        return self._construct is not None or OrderedDict.__len__(self) > 0
+
+    __nonzero__ = __bool__
+
+    def __getitem__(self, key):
+        self.construct()
+        return OrderedDict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        self.construct()
+        return OrderedDict.__contains__(self, key)
+
+    def __iter__(self):
+        self.construct()
+        return OrderedDict.__iter__(self)
+
+    def __len__(self):
+        self.construct()
+        return OrderedDict.__len__(self)
+
+    def __eq__(self, other):
+        self.construct()
+        return OrderedDict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        self.construct()
+        return OrderedDict.__repr__(self)
+
+    def get(self, key, default=None):
+        self.construct()
+        return OrderedDict.get(self, key, default)
+
+    def keys(self):
+        self.construct()
+        return OrderedDict.keys(self)
+
+    def values(self):
+        self.construct()
+        return OrderedDict.values(self)
+
+    def items(self):
+        self.construct()
+        return OrderedDict.items(self)
+
+    def pop(self, *args):
+        self.construct()
+        return OrderedDict.pop(self, *args)
+
+    def copy(self):
+        self.construct()
+        return OrderedDict(OrderedDict.items(self))
+
+
 class SQLAlchemyObjectTypeOptions(ObjectTypeOptions):
     model = None  # type: Model
     registry = None  # type: Registry
     connection = None  # type: Type[Connection]
     id = None  # type: str
+    batching = False  # type: bool
+    projection = False  # type: bool
+    read_only = False  # type: bool
+    accepted_types = None  # type: Dict[Type, Optional[bool]]
+    id_getter = None  # type: Callable[[Model], Any]
 
 
 class SQLAlchemyObjectType(ObjectType):
@@ -100,6 +195,10 @@ class SQLAlchemyObjectType(ObjectType):
         use_connection=None,
         interfaces=(),
         id=None,
+        batching=False,
+        projection=False,
+        read_only=False,
+        lazy_fields=False,
         _meta=None,
         **options
     ):
@@ -115,9 +214,16 @@ class SQLAlchemyObjectType(ObjectType):
             'Registry, received "{}".'
         ).format(cls.__name__, registry)
 
-        sqla_fields = yank_fields_from_attrs(
-            construct_fields(model, registry, only_fields, exclude_fields), _as=Field
-        )
+        def construct_sqla_fields():
+            return yank_fields_from_attrs(
+                construct_fields(
+                    model, registry, only_fields, exclude_fields, batching, cls
+                ),
+                _as=Field,
+            )
+
+        if not lazy_fields:
+            sqla_fields = construct_sqla_fields()
 
         if use_connection is None and interfaces:
             use_connection = any(
@@ -144,13 +250,30 @@ class SQLAlchemyObjectType(ObjectType):
         _meta.model = model
         _meta.registry = registry
 
-        if _meta.fields:
+        if lazy_fields:
+            # Converted when the fields are first read, by the schema
+            base_fields = _meta.fields
+
+            def construct():
+                fields = OrderedDict(base_fields or ())
+                fields.update(construct_sqla_fields())
+                return fields
+
+            _meta.fields = LazyFields(construct)
+        elif _meta.fields:
             _meta.fields.update(sqla_fields)
         else:
             _meta.fields = sqla_fields
 
         _meta.connection = connection
         _meta.id = id or "id"
+        _meta.batching = batching
+        _meta.projection = projection
+        _meta.read_only = read_only
+        # Whether is_type_of accepts instances of a class, by class: None
+        # for unmapped classes, whose instances are rejected with an error
+        _meta.accepted_types = {model: True}
+        _meta.id_getter = get_id_getter(model)
 
         super(SQLAlchemyObjectType, cls).__init_subclass_with_meta__(
             _meta=_meta, interfaces=interfaces, **options
@@ -160,26 +283,100 @@ class SQLAlchemyObjectType(ObjectType):
             registry.register(cls)
 
     @classmethod
-    def is_type_of(cls, root, info):
-        if isinstance(root, cls):
+    def accepts_type(cls, root_type):
+        """Returns whether instances of ``root_type`` are of this type, or
+        None if ``root_type`` isn't mapped."""
+        if issubclass(root_type, cls):
             return True
-        if not is_mapped_instance(root):
+        if issubclass(root_type, Row):
+            return issubclass(root_type._model, cls._meta.model)
+        if sqlalchemyinspect(root_type, raiseerr=False) is None:
+            return None
+        return issubclass(root_type, cls._meta.model)
+
+    @classmethod
+    def is_type_of(cls, root, info):
+        accepted_types = cls._meta.accepted_types
+        root_type = type(root)
+        try:
+            is_type = accepted_types[root_type]
+        except KeyError:
+            is_type = accepted_types[root_type] = cls.accepts_type(root_type)
+        if is_type is None:
             raise Exception(('Received incompatible instance "{}".').format(root))
-        return isinstance(root, cls._meta.model)
+        return is_type
 
     @classmethod
     def get_query(cls, info):
         model = cls._meta.model
-        return get_query(model, info.context)
+        query = get_query(model, info.context)
+        if cls._meta.read_only:
+            # The instances are released with the results
+            session = get_transaction_read_only_session(query.session, model)
+            if session is not None:
+                query = query.with_session(session)
+        if cls._meta.projection:
+            query = load_selected_columns(query, info, cls)
+        return query
 
     @classmethod
     def get_node(cls, info, id):
-        try:
-            return cls.get_query(info).get(id)
-        except NoResultFound:
+        """Returns the instance with the given ``id``, or None. It belongs to
+        the session of the request even with ``read_only``, as mutations
+        modify the nodes they fetch."""
+        model = cls._meta.model
+        key = primary_key_from_id(model, id)
+        if key is None:
+            return None
+        query = cls.get_query(info)
+        if cls._meta.read_only:
+            query = query.with_session(get_query(model, info.context).session)
+        return query.get(key)
+
+    @classmethod
+    def get_node_batched(cls, info, id):
+        """Returns a promise of the instance with the given ``id``, used by
+        ``NodeField`` and ``NodesField``. The ids requested for the same type
+        during the same tick are fetched with one query. With ``read_only``,
+        they are fetched with a read-only session, like ``get_query``. Types
+        overriding ``get_node`` (to check permissions, say) are fetched with
+        it instead, one at a time."""
+        if cls.get_node.__func__ is not SQLAlchemyObjectType.get_node.__func__:
+            return cls.get_node(info, id)
+        model = cls._meta.model
+        key = primary_key_from_id(model, id)
+        if key is None:
             return None
+        # Each projection needs its own query
+        columns = None
+        if cls._meta.projection:
+            columns = get_projected_columns(info, cls)
+            if columns is not None:
+                columns = tuple(columns)
+        session = None
+        if (
+            getattr(model, "query", None) is None
+            and cls.get_query.__func__ is SQLAlchemyObjectType.get_query.__func__
+        ):
+            session = get_session(info.context)
+        if session is not None:
+            # Default query: fetched with a baked query
+            options = [load_only(*columns)] if columns is not None else []
+            loader = get_baked_node_loader(
+                session, model, options, (cls, columns), cls._meta.read_only
+            )
+        else:
+            query = cls.get_query(info)
+            if cls._meta.read_only:
+                # Stored in the session of the context rather than in the
+                # read-only session of the query, new for each call
+                session = get_session(info.context)
+            loader = get_node_loader(query, model, (cls, columns), session)
+        pool = get_query_pool(info.context)
+        if pool is not None:
+            pool.bind(loader.session)
+        return loader.load(key)
 
     def resolve_id(self, info):
-        # graphene_type = info.parent_type.graphene_type
-        keys = self.__mapper__.primary_key_from_instance(self)
-        return tuple(keys) if len(keys) > 1 else keys[0]
+        graphene_type = info.parent_type.graphene_type
+        return graphene_type._meta.id_getter(self)
@@ -1,14 +1,116 @@
+import json
+from operator import attrgetter
+
 from graphene import Argument, Enum, List
+from sqlalchemy import event
 from sqlalchemy.exc import ArgumentError
 from sqlalchemy.inspection import inspect
-from sqlalchemy.orm import class_mapper, object_mapper
+from sqlalchemy.orm import Session, class_mapper, object_mapper, scoped_session
 from sqlalchemy.orm.exc import UnmappedClassError, UnmappedInstanceError
 
+# Key under which the read-only sessions of the transaction, by connection,
+# are stored in ``Session.info``, to be closed at its end
+_READ_ONLY_SESSIONS_KEY = "graphene_sqlalchemy.read_only_sessions"
+# Callables dropping the state of a session at the end of its transaction,
+# see ``on_transaction_end``
+_transaction_end_handlers = []
+
 
 def get_session(context):
     return context.get("session")
 
 
+def get_query_pool(context):
+    """Returns the ``QueryPool`` running the queries of the request, if any"""
+    if context is None:
+        return None
+    return context.get("query_pool")
+
+
+def get_read_only_session(session, model=None):
+    """Returns a throwaway session sharing the connection, and transaction,
+    of ``session``. The instances it loads aren't tracked by ``session``:
+    they are released with the results, rather than kept by its identity
+    map until the end of the request. Returns None if ``session`` has
+    pending changes, which queries of ``session`` would flush first."""
+    if isinstance(session, scoped_session):
+        session = session()
+    if session.new or session.dirty or session.deleted:
+        return None
+    mapper = inspect(model) if model is not None else None
+    return Session(
+        bind=session.connection(mapper=mapper),
+        query_cls=session._query_cls,
+        autoflush=False,
+    )
+
+
+def get_transaction_read_only_session(session, model=None):
+    """Returns a read-only session like ``get_read_only_session``, for
+    queries run after it's returned. It's shared by the queries of the
+    transaction of ``session`` on the same connection, and closed at its end
+    (also ended by ``close()``)."""
+    if isinstance(session, scoped_session):
+        session = session()
+    if session.new or session.dirty or session.deleted:
+        return None
+    mapper = inspect(model) if model is not None else None
+    connection = session.connection(mapper=mapper)
+    read_only_sessions = session.info.setdefault(_READ_ONLY_SESSIONS_KEY, {})
+    read_only_session = read_only_sessions.get(connection)
+    if read_only_session is None:
+        read_only_session = get_read_only_session(session, model)
+        read_only_sessions[connection] = read_only_session
+    return read_only_session
+
+
+def on_transaction_end(handler):
+    """Registers ``handler(session)`` to be called when the root transaction
+    of a session ends (also ended by ``close()``), to drop what's kept in its
+    ``Session.info`` for the request. Usable as a decorator."""
+    _transaction_end_handlers.append(handler)
+    return handler
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        for handler in _transaction_end_handlers:
+            handler(session)
+
+
+@on_transaction_end
+def _close_read_only_sessions(session):
+    for read_only_session in session.info.pop(_READ_ONLY_SESSIONS_KEY, {}).values():
+        read_only_session.close()
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    # The read-only sessions see the flushed rows through the connection, but
+    # not in the instances they loaded before
+    for read_only_session in session.info.get(_READ_ONLY_SESSIONS_KEY, {}).values():
+        read_only_session.expire_all()
+
+
+def supports_window_functions(dialect):
+    """Returns whether ``dialect`` supports window functions such as
+    ``ROW_NUMBER() OVER (...)``, which MySQL only does since 8.0 (MariaDB
+    since 10.2) and SQLite since 3.25."""
+    version = dialect.server_version_info
+    if version is None:
+        # Not connected yet
+        return True
+    if dialect.name == "sqlite":
+        return tuple(version) >= (3, 25)
+    if dialect.name == "mysql":
+        # Told by the version with SQLAlchemy 1.3, by is_mariadb since 1.4
+        if getattr(dialect, "is_mariadb", False) or "MariaDB" in version:
+            return tuple(version[:2]) >= (10, 2)
+        return tuple(version[:1]) >= (8,)
+    return True
+
+
 def get_query(model, context):
     query = getattr(model, "query", None)
     if not query:
@@ -40,6 +142,59 @@ def is_mapped_instance(cls):
         return True
 
 
+def get_id_getter(model):
+    """Returns a function returning the node id of an instance of ``model``:
+    the value of its primary key, or its encoding for composite keys."""
+    mapper = inspect(model)
+    keys = [mapper.get_property_by_column(column).key for column in mapper.primary_key]
+    getter = attrgetter(*keys)
+    if len(keys) == 1:
+        return getter
+    return lambda instance: encode_primary_key(getter(instance))
+
+
+def encode_primary_key(values):
+    """Encodes the values of a composite primary key as a compact JSON list"""
+    return json.dumps(list(values), separators=(",", ":"), default=str)
+
+
+def _coerce_key_value(column, value):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if isinstance(value, python_type):
+        return value
+    try:
+        return python_type(value)
+    except TypeError:
+        return value
+
+
+def primary_key_from_id(model, id):
+    """Returns the primary key tuple of ``model`` identified by the (decoded)
+    node ``id``, with the python type of the primary key columns, or None if
+    the id can't identify an instance."""
+    columns = inspect(model).primary_key
+    if len(columns) == 1 and not isinstance(id, (tuple, list)):
+        values = [id]
+    elif isinstance(id, (tuple, list)):
+        values = id
+    else:
+        try:
+            values = json.loads(id)
+        except (TypeError, ValueError):
+            return None
+    if not isinstance(values, (tuple, list)) or len(values) != len(columns):
+        return None
+    try:
+        return tuple(
+            _coerce_key_value(column, value) for column, value in zip(columns, values)
+        )
+    except ValueError:
+        return None
+
+
 def _symbol_name(column_name, is_asc):
     return column_name + ("_asc" if is_asc else "_desc")
 
@@ -0,0 +1,86 @@
+from graphql.type import GraphQLInterfaceType, GraphQLUnionType
+from sqlalchemy.inspection import inspect as sqlalchemyinspect
+from sqlalchemy.orm import Session, configure_mappers, scoped_session
+
+from .bakery import bake_slices, get_primary_key_query, get_sorted_baked_query
+from .types import LazyFields, SQLAlchemyObjectType
+from .utils import _sort_enum_for_model
+
+
+def get_sqlalchemy_types(schema):
+    """Returns the ``SQLAlchemyObjectType`` subclasses reached by ``schema``"""
+    sqlalchemy_types = []
+    for graphql_type in schema.get_type_map().values():
+        graphene_type = getattr(graphql_type, "graphene_type", None)
+        if isinstance(graphene_type, type) and issubclass(
+            graphene_type, SQLAlchemyObjectType
+        ):
+            sqlalchemy_types.append(graphene_type)
+    return sqlalchemy_types
+
+
+def warmup_types(sqlalchemy_types):
+    """Fills the caches of ``is_type_of`` with the mapped classes of all
+    ``sqlalchemy_types`` and constructs their lazy fields."""
+    classes = set()
+    for sqlalchemy_type in sqlalchemy_types:
+        mapper = sqlalchemyinspect(sqlalchemy_type._meta.model)
+        classes.update(mapper.class_ for mapper in mapper.self_and_descendants)
+    for sqlalchemy_type in sqlalchemy_types:
+        meta = sqlalchemy_type._meta
+        if isinstance(meta.fields, LazyFields):
+            meta.fields.construct()
+        for class_ in classes:
+            if class_ not in meta.accepted_types:
+                meta.accepted_types[class_] = sqlalchemy_type.accepts_type(class_)
+
+
+def warmup_queries(sqlalchemy_types, session):
+    """Compiles the baked queries fetching the instances of
+    ``sqlalchemy_types`` by primary key and, for the ones with a connection,
+    the default pages of their connection fields."""
+    for sqlalchemy_type in sqlalchemy_types:
+        model = sqlalchemy_type._meta.model
+        baked_query = get_primary_key_query(model)
+        if baked_query is not None:
+            baked_query._bake(session)
+        if sqlalchemy_type._meta.connection is None:
+            continue
+        _, default_sort = _sort_enum_for_model(model)
+        for sort in (None, default_sort):
+            baked_query = get_sorted_baked_query(model, sort=sort)
+            if baked_query is not None:
+                bake_slices(baked_query, session)
+
+
+def warmup_schema(schema):
+    """Computes the possible types of the interfaces and unions of
+    ``schema``, which graphql-core does on the first query needing them."""
+    for graphql_type in schema.get_type_map().values():
+        if isinstance(graphql_type, (GraphQLInterfaceType, GraphQLUnionType)):
+            possible_types = schema.get_possible_types(graphql_type)
+            if possible_types:
+                schema.is_possible_type(graphql_type, possible_types[0])
+
+
+def warmup(schema, session=None):
+    """Builds ahead of time what is otherwise built by the first requests
+    of a process: the mapper configuration, the sort enums, the caches of
+    the types and the baked queries of the default connection pages and
+    node lookups. Meant to be called before forking workers, so that they
+    share it copy-on-write.
+
+    The dynamic relationship fields and lazy fields of the types reached by
+    ``schema`` are resolved when it is built. ``session`` is a session of
+    the class used by the requests, needed if it uses a custom query class;
+    it doesn't need to be bound.
+    """
+    configure_mappers()
+    if session is None:
+        session = Session()
+    elif isinstance(session, scoped_session):
+        session = session()
+    sqlalchemy_types = get_sqlalchemy_types(schema)
+    warmup_types(sqlalchemy_types)
+    warmup_queries(sqlalchemy_types, session)
+    warmup_schema(schema)
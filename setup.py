@@ -39,7 +39,7 @@ setup(
     install_requires=[
         "six>=1.10.0",
         "graphene>=2.1.3",
-        "SQLAlchemy",
+        "SQLAlchemy>=1.3",
         "singledispatch>=3.4.0.3",
     ],
     tests_require=["pytest>=2.7.2", "mock", "sqlalchemy_utils"],